@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from pydantic import BaseModel
+from typing import Optional
+import uuid
+from app.db.base import get_db
+from app.db.models import AuthSession
+
+router = APIRouter(tags=["auth"])
+
+# Auth Models
+class AuthInitResponse(BaseModel):
+    token: str
+    bot_url: str
+
+class AuthStatusResponse(BaseModel):
+    status: str
+    access_token: Optional[str] = None
+    user_id: Optional[int] = None
+
+@router.post("/auth/init", response_model=AuthInitResponse)
+async def auth_init(db: AsyncSession = Depends(get_db)):
+    token = str(uuid.uuid4())
+    session = AuthSession(token=token, status="pending")
+    db.add(session)
+    await db.commit()
+    
+    return {
+        "token": token, 
+        "bot_url": f"https://t.me/savetabsbot?start={token}"
+    }
+
+@router.get("/auth/status", response_model=AuthStatusResponse)
+async def auth_status(token: str, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(AuthSession).where(AuthSession.token == token))
+    session = result.scalar_one_or_none()
+    
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+        
+    return {
+        "status": session.status,
+        "access_token": str(session.user_id) if session.user_id else None, 
+        "user_id": session.user_id
+    }
@@ -0,0 +1,72 @@
+from fastapi import Depends, Header, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import logging
+import math
+import os
+from app.db.base import get_db
+from app.core.ratelimit import limiter
+
+# Shared dependencies and helpers for the API routers
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+
+# Rate Limiting
+def enforce_rate_limit(key, budget: str):
+    retry_after = limiter.check(key, budget)
+    if retry_after:
+        logging.info(f"Rate limited {key} on '{budget}' budget, retry in {retry_after:.1f}s")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+async def get_current_user(authorization: str = Header(None), db: AsyncSession = Depends(get_db)):
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing Authorization Header")
+    
+    try:
+        # Expected format: "Bearer <user_id>"
+        scheme, param = authorization.split()
+        if scheme.lower() != 'bearer':
+             raise HTTPException(status_code=401, detail="Invalid Auth Scheme")
+        
+        user_id = int(param)
+        return user_id
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid Auth Token")
+
+def rate_limited(budget: str):
+    """Same as get_current_user, but also charges the user's budget"""
+    async def dependency(current_user_id: int = Depends(get_current_user)):
+        enforce_rate_limit(current_user_id, budget)
+        return current_user_id
+    return dependency
+
+# Conditional GET helpers
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if not if_none_match or not etag:
+        return False
+
+    def strip_weak(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    return strip_weak(etag) in {strip_weak(t) for t in candidates}
+
+def set_cache_headers(response: Response, etag: Optional[str]):
+    if etag:
+        response.headers["ETag"] = etag
+    # Responses depend on the bearer token, so the browser must always revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = "Authorization"
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag)
+    return response
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.future import select
+import html
+import logging
+import mimetypes
+import os
+from app.db.base import AsyncSessionLocal
+from app.db.models import Post
+from app.core.config import settings
+from app.core.media_cache import media_cache
+from app.core.storage import TELEGRAM_MEDIA_URL_PREFIX
+from app.core.telegram import FileTooLarge, create_bot, download_file, is_too_large
+
+# Created on the first cache miss, so the API doesn't need a bot token to start
+_bot = None
+
+# Cached files never change (they're keyed by Telegram's file_unique_id)
+CACHED_MEDIA_HEADERS = {"Cache-Control": "private, max-age=31536000, immutable"}
+
+PLACEHOLDER_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="640" height="360" viewBox="0 0 640 360">
+<rect width="640" height="360" fill="#f3f4f6"/>
+<text x="320" y="170" text-anchor="middle" font-family="sans-serif" font-size="24" fill="#374151">{title}</text>
+<text x="320" y="205" text-anchor="middle" font-family="sans-serif" font-size="16" fill="#6b7280">{subtitle}</text>
+</svg>"""
+
+
+def get_bot():
+    global _bot
+    if _bot is None:
+        _bot = create_bot(rate_share=settings.TELEGRAM_API_RATE_SHARE)
+    return _bot
+
+
+async def close_bot():
+    if _bot is not None:
+        await _bot.session.close()
+
+
+router = APIRouter(tags=["media"], on_shutdown=[close_bot])
+
+
+def too_large_placeholder(media_type: str, file_size, source_url=None) -> Response:
+    """Shown instead of media the Bot API won't let us download"""
+    kind = "Video" if media_type == "video" else "File"
+    size = f" ({file_size / (1024 * 1024):.0f} MB)" if file_size else ""
+    # Only posts forwarded from a channel have a message to point at
+    subtitle = f"Original: {source_url}" if source_url else "Telegram doesn't let bots download files this big"
+    svg = PLACEHOLDER_SVG.format(
+        title=f"{kind} is too large to store{size}",
+        subtitle=html.escape(subtitle),
+    )
+    return Response(svg, media_type="image/svg+xml", headers={"Cache-Control": "private, max-age=86400"})
+
+
+@router.get("/media/{name}")
+async def get_media(name: str):
+    """Media kept on Telegram, fetched into the local cache on first view.
+
+    Like /static, it's addressed by an unguessable per-post name and needs
+    no auth header, so it works as a plain <img>/<video> src.
+    """
+    # Short session: no pooled connection is held during the download
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Post.media_file_id, Post.media_file_unique_id, Post.media_type, Post.media_meta, Post.source_url)
+            .where(Post.media_url == TELEGRAM_MEDIA_URL_PREFIX + name)
+            .limit(1)
+        )
+        post = result.first()
+    if not post or not post.media_file_id:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    meta = post.media_meta or {}
+    if is_too_large(meta.get("file_size")):
+        return too_large_placeholder(post.media_type, meta.get("file_size"), post.source_url)
+
+    if not settings.BOT_TOKEN:
+        raise HTTPException(status_code=503, detail="Media fetching is not configured")
+
+    cache_name = f"{post.media_file_unique_id}{os.path.splitext(name)[1]}"
+    try:
+        path = await media_cache.acquire(
+            cache_name,
+            lambda destination: download_file(get_bot(), post.media_file_id, destination),
+        )
+    except FileTooLarge:
+        return too_large_placeholder(post.media_type, meta.get("file_size"), post.source_url)
+    except Exception as e:
+        logging.warning(f"Failed to fetch media {name} from Telegram: {e}")
+        raise HTTPException(status_code=502, detail="Failed to fetch media from Telegram")
+
+    return FileResponse(
+        path,
+        media_type=meta.get("mime_type") or mimetypes.guess_type(name)[0],
+        headers=CACHED_MEDIA_HEADERS,
+        background=BackgroundTask(media_cache.release, cache_name),
+    )
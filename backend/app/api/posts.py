@@ -0,0 +1,477 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, UploadFile, File, Form
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, update, case
+from pydantic import BaseModel
+from typing import Optional, List
+import asyncio
+import os
+import uuid
+import json
+import time
+from app.db.base import get_db
+from app.db.models import Post
+from app.db.versions import bump_feed_versions, get_post_tab_ids, get_feed_etag
+from app.db.ingest import api_ingest_key, insert_posts, get_posts_by_ingest_keys
+from app.db.jobs import enqueue
+from app.db.storage import get_storage_used, add_storage_used, charge_storage, hand_over_media_sizes, unlink_unreferenced_media
+from app.db.similar import find_similar, find_duplicate, link_to
+from app.core.richtext import render_html, RENDER_VERSION
+from app.core.linkpreview import find_first_url
+from app.core.phash import image_hash, hash_columns, MAX_SEARCH_DISTANCE
+from app.core.storage import QuotaExceeded, save_upload, remaining_quota, media_url_for, media_path, discard_file
+from app.core.config import settings
+from app.core.telegram import is_too_large
+from app.api.deps import rate_limited, etag_matches, set_cache_headers, not_modified
+
+router = APIRouter(tags=["posts"])
+
+def media_item(post: Post) -> dict:
+    item = {
+        'url': post.media_url,
+        'type': post.media_type
+    }
+    # Past the Bot API download limit: the URL serves a placeholder image
+    if post.media_meta and is_too_large(post.media_meta.get('file_size')):
+        item['too_large'] = True
+    return item
+
+def current_html(post: Post) -> Optional[str]:
+    """content_html unless an older RENDER_VERSION made it (the client then
+    renders content + entities itself until the rerender job catches up)"""
+    if post.render_version != RENDER_VERSION:
+        return None
+    return post.content_html
+
+@router.get("/posts")
+async def get_posts(
+    request: Request,
+    response: Response,
+    current_user_id: int = Depends(rate_limited("read")),
+    db: AsyncSession = Depends(get_db),
+    tab_id: Optional[int] = None
+):
+    # Answer revalidations from the version counter without touching posts
+    etag = await get_feed_etag(db, current_user_id, tab_id)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
+    query = select(Post).where(Post.user_id == current_user_id)
+    
+    if tab_id is not None:
+        query = query.where(Post.tab_id == tab_id)
+    else:
+
+        # If tab_id is None, return posts with tab_id IS NULL (Inbox)
+        query = query.where(Post.tab_id.is_(None))
+
+    # Sort by position (manual order) then created_at (newest first fallback)
+    query = query.order_by(Post.position.asc(), Post.created_at.desc())
+    
+    result = await db.execute(query)
+    posts = result.scalars().all()
+    
+    # Updated Grouping Logic
+    grouped_posts = []
+    processed_group_ids = set()
+    
+    # helper to find all siblings
+    def get_group_siblings(group_id, all_posts):
+        return [p for p in all_posts if p.media_group_id == group_id]
+
+    for post in posts:
+        # 1. Check if part of a media group
+        if post.media_group_id:
+            if post.media_group_id in processed_group_ids:
+                continue
+                
+            # New group encountered
+            siblings = get_group_siblings(post.media_group_id, posts)
+            
+            # Sort siblings by id or created_at to maintain internal order (if any)
+            # usually message id is good proxy for chronological order in TG
+            siblings.sort(key=lambda x: x.telegram_message_id)
+            
+            # Construct group object
+            # Use the properties of the *first* sibling (or the one carrying content)
+            # Generally, the caption is on one of them (often the first or last).
+            
+            # Find caption
+            content = None
+            entities = None
+            content_html = None
+            source_url = None
+            
+            media_items = []
+            
+            for sib in siblings:
+                if sib.content and not content:
+                    content = sib.content
+                    entities = sib.entities
+                    content_html = current_html(sib)
+                    source_url = sib.source_url
+                
+                if sib.media_url and sib.media_type:
+                    media_items.append(media_item(sib))
+
+            group_obj = {
+                'id': post.id, # Use ID of the current post as representative (for key/sorting)
+                'telegram_message_id': post.telegram_message_id,
+                'content': content,
+                'entities': entities,
+                'content_html': content_html,
+                'source_url': source_url,
+                'created_at': post.created_at,
+                'media_group_id': post.media_group_id,
+                'media': media_items
+            }
+            
+            grouped_posts.append(group_obj)
+            processed_group_ids.add(post.media_group_id)
+            
+        else:
+            # 2. Single Post
+            single_post = {
+                'id': post.id,
+                'telegram_message_id': post.telegram_message_id,
+                'content': post.content,
+                'entities': post.entities,
+                'content_html': current_html(post),
+                'source_url': post.source_url,
+                'link_preview': post.link_preview,
+                'created_at': post.created_at,
+                'media_group_id': None,
+                'media': []
+            }
+            if post.media_url and post.media_type:
+                single_post['media'].append(media_item(post))
+            grouped_posts.append(single_post)
+
+    return grouped_posts
+
+# Images up to this size are saved past the quota long enough to find out
+# whether they're near-duplicates (which are linked and don't count)
+DUPLICATE_CHECK_MAX_BYTES = 20 * 1024 * 1024
+
+def quota_exceeded() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Storage quota of {settings.STORAGE_QUOTA_BYTES} bytes exceeded"
+    )
+
+def discard_uploads(rows: List[dict]):
+    """Delete the files saved for rows that won't be inserted"""
+    for row in rows:
+        # Linked rows (media_size 0) point at another post's file
+        if row.get('media_size'):
+            discard_file(media_path(row['media_url']))
+
+@router.post("/posts")
+async def create_post(
+    content: str = Form(None),
+    link_preview: str = Form(None),
+    media: List[UploadFile] = File(None),
+    idempotency_key: Optional[str] = Header(None, max_length=200),
+    current_user_id: int = Depends(rate_limited("upload")),
+    db: AsyncSession = Depends(get_db)
+):
+    # One ingest key per created post; a retry with the same Idempotency-Key
+    # gets the posts of the first attempt back instead of duplicates
+    ingest_keys = [api_ingest_key(idempotency_key, i) for i in range(len(media) if media else 1)]
+    if idempotency_key:
+        existing = await get_posts_by_ingest_keys(db, current_user_id, ingest_keys)
+        if existing:
+            return created_post_response(existing)
+
+    # Dummy Telegram Message ID (negative timestamp). Not an identifier any
+    # more (see ingest_key), it only orders the items of an album.
+    dummy_tg_id = -int(time.time())
+    media_group_id = str(uuid.uuid4()) if media and len(media) > 1 else None
+    
+    rows = []
+
+    # Case 1: Text only
+    if not media:
+        rows.append(dict(
+            user_id=current_user_id,
+            telegram_message_id=dummy_tg_id,
+            ingest_key=ingest_keys[0],
+            content=content,
+            content_html=render_html(content, None),
+            render_version=RENDER_VERSION,
+            media_url=None,
+            media_type=None,
+            link_preview=json.loads(link_preview) if link_preview else None,
+        ))
+
+    # Case 2: With Media
+    else:
+        remaining = remaining_quota(await get_storage_used(db, current_user_id))
+        # Images that may turn out to be near-duplicates (linked, not stored)
+        # are only charged to the quota once that's been checked
+        check_duplicates = settings.DUPLICATE_IMAGE_POLICY != "keep"
+
+        for i, file in enumerate(media):
+            # Determine media type
+            content_type = file.content_type
+            if content_type.startswith('image/'):
+                media_type = 'photo'
+            elif content_type.startswith('video/'):
+                media_type = 'video'
+            else:
+                media_type = 'document'
+
+            deferred = check_duplicates and media_type == 'photo'
+            limit = remaining
+            if deferred and remaining is not None:
+                limit = max(remaining, DUPLICATE_CHECK_MAX_BYTES)
+                
+            # Save file (streamed, and cut off as soon as it would exceed the quota)
+            file_ext = os.path.splitext(file.filename)[1]
+            filename = f"{uuid.uuid4()}{file_ext}"
+            try:
+                size = save_upload(file.file, filename, limit)
+            except QuotaExceeded:
+                discard_uploads(rows)
+                raise quota_exceeded()
+            if remaining is not None and not deferred:
+                remaining -= size
+            
+            # Create Post
+            # Associate content only with the first media item
+            post_content = content if i == 0 else None
+            
+            rows.append(dict(
+                user_id=current_user_id,
+                telegram_message_id=dummy_tg_id,
+                ingest_key=ingest_keys[i],
+                content=post_content,
+                content_html=render_html(post_content, None),
+                render_version=RENDER_VERSION,
+                media_url=media_url_for(filename),
+                media_type=media_type,
+                media_size=size,
+                media_group_id=media_group_id,
+                link_preview=json.loads(link_preview) if link_preview and i == 0 else None,
+            ))
+            
+            dummy_tg_id -= 1
+
+        # Perceptual hashes of the images, decoded in parallel by the hash pool
+        photo_rows = [row for row in rows if row['media_type'] == 'photo']
+        hashes = await asyncio.gather(*(image_hash(media_path(row['media_url'])) for row in photo_rows))
+        for row in rows:
+            row.update(hash_columns(None))
+        for row, phash in zip(photo_rows, hashes):
+            row.update(hash_columns(phash))
+
+        # An upload is always saved (even with the "skip" policy), but an image
+        # the user already has can point at the stored copy instead of a new file
+        if check_duplicates:
+            for i, row in enumerate(rows):
+                if row['media_type'] != 'photo':
+                    continue
+                original = await find_duplicate(db, current_user_id, row['phash'])
+                if original is not None:
+                    discard_file(media_path(row['media_url']))
+                    rows[i] = link_to(row, original)
+                elif remaining is not None:
+                    if row['media_size'] > remaining:
+                        discard_uploads(rows)
+                        raise quota_exceeded()
+                    remaining -= row['media_size']
+
+    # INSERT ... ON CONFLICT DO NOTHING RETURNING: a concurrent retry that
+    # got there first makes this insert nothing
+    saved_posts = await insert_posts(db, rows)
+    inserted_keys = {p.ingest_key for p in saved_posts}
+    discard_uploads([row for row in rows if row['ingest_key'] not in inserted_keys])
+
+    if saved_posts:
+        # The checks above only saw the usage at the start of the request;
+        # the charge itself is what guards against concurrent uploads
+        if not await charge_storage(db, current_user_id, sum(p.media_size or 0 for p in saved_posts)):
+            await db.rollback()
+            discard_uploads([row for row in rows if row['ingest_key'] in inserted_keys])
+            raise quota_exceeded()
+        await bump_feed_versions(db, current_user_id, [None])
+        # No preview from the client: fetch one in the background
+        main_post = saved_posts[0]
+        url = find_first_url(main_post.content) if not link_preview else None
+        if url:
+            await enqueue(db, "link_preview", {"post_id": main_post.id, "user_id": current_user_id, "url": url})
+    await db.commit()
+
+    if len(saved_posts) < len(rows):
+        saved_posts = await get_posts_by_ingest_keys(db, current_user_id, ingest_keys)
+    return created_post_response(saved_posts)
+
+def created_post_response(saved_posts: List[Post]) -> dict:
+    """Posts of one create_post request, in the grouped format of GET /posts"""
+    # The first post carries the text (and link preview) of the request
+    main_post = saved_posts[0]
+    
+    response_obj = {
+        'id': main_post.id,
+        'telegram_message_id': main_post.telegram_message_id,
+        'content': main_post.content,
+        'entities': None,
+        'content_html': current_html(main_post),
+        'link_preview': main_post.link_preview,
+        'source_url': main_post.source_url,
+        'created_at': main_post.created_at,
+        'media_group_id': main_post.media_group_id,
+        'media': []
+    }
+    
+    for p in saved_posts:
+        if p.media_url and p.media_type:
+            response_obj['media'].append(media_item(p))
+            
+    return response_obj
+
+class ReorderRequest(BaseModel):
+    post_ids: list[int]
+
+@router.put("/posts/reorder")
+async def reorder_posts(
+    request: ReorderRequest,
+    current_user_id: int = Depends(rate_limited("write")),
+    db: AsyncSession = Depends(get_db)
+):
+    # Single UPDATE ... SET position = CASE id WHEN ... END for the whole list.
+    # Filtering by user_id keeps it safe and lets Postgres prune partitions.
+    if not request.post_ids:
+        return {"status": "success"}
+
+    tab_ids = await get_post_tab_ids(db, current_user_id, request.post_ids)
+
+    positions = {post_id: index for index, post_id in enumerate(request.post_ids)}
+    await db.execute(
+        update(Post)
+        .where(Post.user_id == current_user_id)
+        .where(Post.id.in_(positions.keys()))
+        .values(position=case(positions, value=Post.id))
+        .execution_options(synchronize_session=False)
+    )
+        
+    await bump_feed_versions(db, current_user_id, tab_ids)
+    await db.commit()
+    return {"status": "success"}
+
+@router.delete("/posts/{post_id}")
+async def delete_post(
+    post_id: int, 
+    current_user_id: int = Depends(rate_limited("write")),
+    db: AsyncSession = Depends(get_db)
+):
+    # Get the post first to check for media_group_id AND ownership.
+    # Always filter by user_id so Postgres can prune partitions.
+    result = await db.execute(select(Post).where(Post.id == post_id, Post.user_id == current_user_id))
+    post = result.scalar_one_or_none()
+    
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+        
+    if post.media_group_id:
+        # Delete all posts in the group
+        query = (
+            delete(Post)
+            .where(Post.user_id == current_user_id)
+            .where(Post.media_group_id == post.media_group_id)
+        )
+    else:
+        # Delete single post
+        query = delete(Post).where(Post.id == post_id, Post.user_id == current_user_id)
+
+    result = await db.execute(
+        query
+        .returning(Post.media_url, Post.media_size)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = result.all()
+        
+    # Files still linked from other posts stay charged to the user
+    freed = sum(row.media_size or 0 for row in deleted)
+    freed -= await hand_over_media_sizes(db, current_user_id, [(row.media_url, row.media_size) for row in deleted])
+    await add_storage_used(db, current_user_id, -freed)
+    await bump_feed_versions(db, current_user_id, [post.tab_id])
+    await db.commit()
+
+    await unlink_unreferenced_media(db, [row.media_url for row in deleted])
+    return {"message": "Post deleted"}
+
+@router.patch("/posts/{post_id}/move")
+async def move_post(
+    post_id: int,
+    request: dict,
+    current_user_id: int = Depends(rate_limited("write")),
+    db: AsyncSession = Depends(get_db)
+):
+    tab_id = request.get("tab_id") # Can be None for Inbox
+    
+    # Check if post belongs to user
+    result = await db.execute(select(Post).where(Post.id == post_id, Post.user_id == current_user_id))
+    post = result.scalar_one_or_none()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    old_tab_id = post.tab_id
+
+    # If media group, move all parts
+    if post.media_group_id:
+         await db.execute(
+            update(Post)
+            .where(Post.media_group_id == post.media_group_id)
+            .where(Post.user_id == current_user_id)
+            .values(tab_id=tab_id)
+        )
+    else:
+        post.tab_id = tab_id
+        
+    await bump_feed_versions(db, current_user_id, [old_tab_id, tab_id])
+    await db.commit()
+    return {"status": "success"}
+
+@router.get("/posts/{post_id}/similar")
+async def get_similar_posts(
+    post_id: int,
+    max_distance: int = Query(settings.SIMILAR_IMAGE_MAX_DISTANCE, ge=0, le=MAX_SEARCH_DISTANCE),
+    limit: int = Query(20, ge=1, le=100),
+    current_user_id: int = Depends(rate_limited("read")),
+    db: AsyncSession = Depends(get_db)
+):
+    """The user's other posts with a near-identical image, closest first"""
+    result = await db.execute(select(Post).where(Post.id == post_id, Post.user_id == current_user_id))
+    post = result.scalar_one_or_none()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    if post.phash is None:
+        return []
+
+    matches = await find_similar(db, current_user_id, post.phash, max_distance, limit, exclude_id=post.id)
+    return [
+        {
+            'id': similar.id,
+            'tab_id': similar.tab_id,
+            'content': similar.content,
+            'content_html': current_html(similar),
+            'source_url': similar.source_url,
+            'created_at': similar.created_at,
+            'media_group_id': similar.media_group_id,
+            'media': [media_item(similar)],
+            'distance': distance,
+        }
+        for similar, distance in matches
+    ]
+
+@router.get("/storage")
+async def get_storage(
+    current_user_id: int = Depends(rate_limited("read")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "used_bytes": await get_storage_used(db, current_user_id),
+        "quota_bytes": settings.STORAGE_QUOTA_BYTES,
+    }
@@ -0,0 +1,127 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update
+from pydantic import BaseModel
+from app.db.base import get_db
+from app.db.models import Post, Tab
+from app.db.versions import bump_feed_versions, bump_tabs_version, get_tabs_etag
+from app.api.deps import rate_limited, etag_matches, set_cache_headers, not_modified
+
+router = APIRouter(tags=["tabs"])
+
+@router.delete("/tabs/{tab_id}")
+async def delete_tab(
+    tab_id: int,
+    current_user_id: int = Depends(rate_limited("write")),
+    db: AsyncSession = Depends(get_db)
+):
+    # Check ownership
+    result = await db.execute(select(Tab).where(Tab.id == tab_id))
+    tab = result.scalar_one_or_none()
+
+    if not tab:
+        raise HTTPException(status_code=404, detail="Tab not found")
+        
+    if tab.user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to delete this tab")
+
+    # Move posts to Inbox (tab_id = NULL)
+    await db.execute(
+        update(Post)
+        .where(Post.user_id == current_user_id)
+        .where(Post.tab_id == tab_id)
+        .values(tab_id=None)
+    )
+
+    # Delete the tab
+    await db.delete(tab)
+    await bump_feed_versions(db, current_user_id, [None])
+    await bump_tabs_version(db, current_user_id)
+    await db.commit()
+
+    return {"message": "Tab deleted, posts moved to Inbox"}
+
+@router.get("/tabs")
+async def get_tabs(
+    request: Request,
+    response: Response,
+    current_user_id: int = Depends(rate_limited("read")),
+    db: AsyncSession = Depends(get_db)
+):
+    etag = await get_tabs_etag(db, current_user_id)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
+    result = await db.execute(select(Tab).where(Tab.user_id == current_user_id).order_by(Tab.position.asc(), Tab.created_at.asc()))
+    tabs = result.scalars().all()
+    # Explicit fields: the per-tab feed version must not leak into this payload,
+    # otherwise the tab list would change without tabs_version being bumped
+    return [
+        {
+            'id': tab.id,
+            'user_id': tab.user_id,
+            'title': tab.title,
+            'position': tab.position,
+            'created_at': tab.created_at,
+        }
+        for tab in tabs
+    ]
+
+class ReorderTabsRequest(BaseModel):
+    tab_ids: list[int]
+
+@router.put("/tabs/reorder")
+async def reorder_tabs(
+    request: ReorderTabsRequest,
+    current_user_id: int = Depends(rate_limited("write")),
+    db: AsyncSession = Depends(get_db)
+):
+    for index, tab_id in enumerate(request.tab_ids):
+        await db.execute(
+            update(Tab)
+            .where(Tab.id == tab_id)
+            .where(Tab.user_id == current_user_id)
+            .values(position=index)
+        )
+    await bump_tabs_version(db, current_user_id)
+    await db.commit()
+    return {"status": "success"}
+
+@router.post("/tabs")
+async def create_tab(
+    request: dict,
+    current_user_id: int = Depends(rate_limited("write")),
+    db: AsyncSession = Depends(get_db)
+):
+    title = request.get("title")
+    if not title:
+        raise HTTPException(status_code=400, detail="Title is required")
+    
+    new_tab = Tab(user_id=current_user_id, title=title)
+    db.add(new_tab)
+    await bump_tabs_version(db, current_user_id)
+    await db.commit()
+    await db.refresh(new_tab)
+    return new_tab
+
+@router.delete("/tabs/{tab_id}")
+async def delete_tab(
+    tab_id: int,
+    current_user_id: int = Depends(rate_limited("write")),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(select(Tab).where(Tab.id == tab_id, Tab.user_id == current_user_id))
+    tab = result.scalar_one_or_none()
+    if not tab:
+        raise HTTPException(status_code=404, detail="Tab not found")
+        
+    # Set posts in this tab to Inbox (tab_id=None)
+    await db.execute(update(Post).where(Post.user_id == current_user_id, Post.tab_id == tab_id).values(tab_id=None))
+    
+    await db.delete(tab)
+    await bump_feed_versions(db, current_user_id, [None])
+    await bump_tabs_version(db, current_user_id)
+    await db.commit()
+    return {"status": "success"}
@@ -0,0 +1,26 @@
+import asyncio
+from fastapi import APIRouter, Depends
+from app.api.deps import rate_limited
+from app.core.linkpreview import fetch_link_preview
+
+router = APIRouter(tags=["utils"])
+
+# Link Preview Utils
+# Fetches arbitrary URLs on the caller's behalf, so it's charged to the user's
+# own "fetch" budget (an address-keyed limit would be shared by everyone
+# behind the same proxy or NAT)
+@router.get("/utils/link-preview", dependencies=[Depends(rate_limited("fetch"))])
+async def get_link_preview(url: str):
+    try:
+        # Blocking HTTP + parsing, kept off the event loop
+        return await asyncio.to_thread(fetch_link_preview, url)
+    except Exception as e:
+        print(f"Error fetching preview: {e}")
+        # Return partial info or just the url if failed
+        return {
+            "url": url,
+            "title": "",
+            "description": "",
+            "image": "",
+            "site_name": ""
+        }
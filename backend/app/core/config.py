@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import computed_field
 
@@ -6,6 +6,73 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     BOT_TOKEN: Optional[str] = None
 
+    # Per-user rate limits: tokens per second and burst size for each budget
+    RATE_LIMIT_READ_RATE: float = 10.0
+    RATE_LIMIT_READ_BURST: float = 60
+    RATE_LIMIT_WRITE_RATE: float = 5.0
+    RATE_LIMIT_WRITE_BURST: float = 30
+    RATE_LIMIT_UPLOAD_RATE: float = 1.0
+    RATE_LIMIT_UPLOAD_BURST: float = 20
+    RATE_LIMIT_FETCH_RATE: float = 0.5
+    RATE_LIMIT_FETCH_BURST: float = 10
+    # Max messages the bot processes at once (shared fairly between users)
+    BOT_INGEST_CONCURRENCY: int = 8
+
+    # Per-user media storage quota in bytes (None = unlimited)
+    STORAGE_QUOTA_BYTES: Optional[int] = None
+    # Unreferenced media files younger than this are left alone by the GC
+    MEDIA_GC_GRACE_SECONDS: int = 24 * 3600
+
+    # Bot API server (e.g. a local telegram-bot-api server, or a fake one in tests)
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    # The public Bot API refuses to hand out files larger than this
+    TELEGRAM_DOWNLOAD_LIMIT_BYTES: int = 20 * 1024 * 1024
+    # Local cache of media fetched from Telegram on first view (LRU, bounded size)
+    MEDIA_CACHE_DIR: Optional[str] = None
+    MEDIA_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+
+    # Outbound Bot API limits (Telegram allows ~30 messages/s overall, ~1/s per chat)
+    TELEGRAM_GLOBAL_RATE: float = 25
+    TELEGRAM_GLOBAL_BURST: float = 30
+    # The bot and the API (media fetching) pace the token separately, in
+    # memory; the API process gets this share of the global limit, the bot
+    # the rest, so together they stay under it
+    TELEGRAM_API_RATE_SHARE: float = 0.3
+    TELEGRAM_CHAT_RATE: float = 1
+    TELEGRAM_CHAT_BURST: float = 3
+    # How often a request is retried after a 429 (waiting retry_after each time)
+    TELEGRAM_MAX_RETRIES: int = 3
+    # One "Saved N items" status message per burst of messages, edited as
+    # more arrive; a burst ends after this many idle seconds
+    STATUS_BURST_IDLE_SECONDS: float = 10
+    STATUS_EDIT_INTERVAL_SECONDS: float = 2
+
+    # Background jobs (python -m app.main_worker)
+    JOB_WORKER_CONCURRENCY: int = 4
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 5
+    # Retry n waits JOB_RETRY_BASE_SECONDS * 2^(n-1), up to JOB_RETRY_MAX_SECONDS
+    JOB_RETRY_BASE_SECONDS: float = 10
+    JOB_RETRY_MAX_SECONDS: float = 3600
+    # A running job is given up on (and retried) after this long
+    JOB_TIMEOUT_SECONDS: float = 300
+    # Finished jobs are kept this long; dead-lettered ones until retried
+    JOB_RETENTION_SECONDS: int = 7 * 24 * 3600
+
+    # Perceptual image hashes (near-duplicate detection) are computed in a
+    # pool of this many processes
+    IMAGE_HASH_WORKERS: int = 2
+    # An incoming image within DUPLICATE_IMAGE_MAX_DISTANCE bits of one already
+    # in the user's archive is either kept as usual ("keep"), saved as a post
+    # pointing at the stored copy ("link"), or not saved at all ("skip"; bot
+    # only, and posts carrying their own text are linked instead). With
+    # "keep" the bot doesn't fetch photos to hash them, so only uploads made
+    # through the API show up in GET /posts/{id}/similar
+    DUPLICATE_IMAGE_POLICY: Literal["keep", "link", "skip"] = "keep"
+    DUPLICATE_IMAGE_MAX_DISTANCE: int = 4
+    # Default max_distance of GET /posts/{id}/similar
+    SIMILAR_IMAGE_MAX_DISTANCE: int = 10
+
     @computed_field
     @property
     def ASYNC_DATABASE_URL(self) -> str:
@@ -0,0 +1,66 @@
+import json
+import re
+from typing import Optional
+
+URL_RE = re.compile(r"https?://[^\s<>\"']+")
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+def find_first_url(content: Optional[str], entities=None) -> Optional[str]:
+    """First link of a post: a text_link entity, else a URL in the text"""
+    if isinstance(entities, str):
+        entities = json.loads(entities)
+    for entity in entities or []:
+        if entity.get('type') == 'text_link' and entity.get('url', '').startswith(('http://', 'https://')):
+            return entity['url']
+
+    match = URL_RE.search(content or "")
+    if not match:
+        return None
+    # Trailing punctuation is almost always part of the sentence, not the URL
+    return match.group(0).rstrip(".,;:!?)")
+
+
+def fetch_link_preview(url: str) -> dict:
+    """OpenGraph title / description / image of a page (blocking, raises on failure)"""
+    # Heavy imports are deferred to the first call to keep API cold start fast
+    import requests
+    from bs4 import BeautifulSoup
+
+    response = requests.get(url, headers=HEADERS, timeout=5)
+    response.raise_for_status()
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+
+    title = soup.find("meta", property="og:title")
+    description = soup.find("meta", property="og:description")
+    image = soup.find("meta", property="og:image")
+    site_name = soup.find("meta", property="og:site_name")
+
+    # Fallbacks
+    if not title:
+        title = soup.title
+        title_text = title.string if title else ""
+    else:
+        title_text = title["content"]
+
+    description_text = description["content"] if description else ""
+    image_url = image["content"] if image else ""
+    site_name_text = site_name["content"] if site_name else ""
+
+    # Basic descriptions fallbacks
+    if not description_text:
+         meta_desc = soup.find("meta", attrs={"name": "description"})
+         if meta_desc:
+             description_text = meta_desc["content"]
+
+    return {
+        "url": url,
+        "title": title_text,
+        "description": description_text,
+        "image": image_url,
+        "site_name": site_name_text
+    }
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict
+from app.core.config import settings
+from app.core.storage import PARTIAL_SUFFIX, discard_file
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "media")
+
+
+class MediaCache:
+    """Files on local disk, evicted least-recently-used to stay under max_bytes.
+
+    The index (name -> size, oldest first) lives in memory and is rebuilt
+    from the directory on first use, ordered by mtime; hits touch the file so
+    the order survives restarts. Concurrent misses for the same name share
+    one fetch. Entries handed out by acquire() are pinned until release(),
+    so a file is never evicted while it's being sent.
+
+    Each process keeps its own index; several API workers sharing the
+    directory stay correct (files are published with an atomic rename) but
+    may briefly go over budget or fetch the same file twice.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._pins: Counter = Counter()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        files = []
+        with os.scandir(self.directory) as listing:
+            for entry in listing:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if entry.name.endswith(PARTIAL_SUFFIX):
+                    # Left over from a download interrupted by a restart
+                    discard_file(entry.path)
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+        self._loaded = True
+        self._evict()
+
+    async def acquire(self, name: str, fetch: Callable[[str], Awaitable[None]]) -> str:
+        """Path of the cached file `name`, calling fetch(destination) on a miss.
+
+        The file stays pinned until release(name) is called.
+        """
+        self._load()
+
+        if name in self._entries:
+            path = self.path_for(name)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Removed behind our back (e.g. by another worker's eviction)
+                self._forget(name)
+            else:
+                self._entries.move_to_end(name)
+                self._pins[name] += 1
+                self.hits += 1
+                return path
+
+        future = self._inflight.get(name)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(self._fetch(name, fetch))
+            self._inflight[name] = future
+            future.add_done_callback(lambda f: self._fetch_done(name, f))
+
+        # Pinned before the download finishes, so it can't be evicted
+        # between landing on disk and being sent
+        self._pins[name] += 1
+        try:
+            # A viewer going away mustn't cancel the download for everyone else
+            return await asyncio.shield(future)
+        except BaseException:
+            self.release(name)
+            raise
+
+    def release(self, name: str):
+        self._pins[name] -= 1
+        if self._pins[name] <= 0:
+            del self._pins[name]
+            self._evict()
+
+    async def _fetch(self, name: str, fetch: Callable[[str], Awaitable[None]]) -> str:
+        path = self.path_for(name)
+        partial = path + PARTIAL_SUFFIX
+        try:
+            await fetch(partial)
+            os.replace(partial, path)
+        except BaseException:
+            discard_file(partial)
+            raise
+
+        size = os.path.getsize(path)
+        if name in self._entries:
+            self._total -= self._entries[name]
+        self._entries[name] = size
+        self._total += size
+        return path
+
+    def _fetch_done(self, name: str, future: asyncio.Future):
+        self._inflight.pop(name, None)
+        if not future.cancelled():
+            # Mark the error as retrieved even if every waiter went away
+            future.exception()
+
+    def _forget(self, name: str):
+        self._total -= self._entries.pop(name)
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        for name in list(self._entries):
+            if self._total <= self.max_bytes:
+                break
+            if self._pins[name] > 0:
+                continue
+            self._pins.pop(name, None)
+            try:
+                discard_file(self.path_for(name))
+            except OSError as e:
+                logging.warning(f"Failed to evict cached media {name}: {e}")
+                continue
+            self._forget(name)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._entries),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "downloading": len(self._inflight),
+        }
+
+
+media_cache = MediaCache(settings.MEDIA_CACHE_DIR or DEFAULT_CACHE_DIR, settings.MEDIA_CACHE_MAX_BYTES)
@@ -0,0 +1,115 @@
+import asyncio
+import io
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Union
+from app.core.config import settings
+
+# Perceptual hash for near-duplicate images: a 64-bit difference hash (dHash).
+# The image is shrunk to 9x8 grayscale and each bit says whether a pixel is
+# brighter than its right neighbour. Re-encoding, resizing and recompression
+# flip only a few bits, so copies of the same picture are a small Hamming
+# distance apart even though their bytes differ.
+
+HASH_WIDTH, HASH_HEIGHT = 8, 8
+HASH_BITS = HASH_WIDTH * HASH_HEIGHT
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# Bands for multi-index lookups (see app/db/similar.py)
+BAND_BITS = 16
+BANDS = HASH_BITS // BAND_BITS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# Searching further out makes the band neighbourhoods too big to be selective
+MAX_SEARCH_DISTANCE = 15
+
+
+def dhash(source: Union[str, bytes]) -> int:
+    """dHash of an image file path or encoded image bytes (blocking, CPU bound)"""
+    # Pillow is only needed in the pool processes
+    from PIL import Image
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding; far cheaper for photos
+        image.draft("L", (HASH_WIDTH * 8, HASH_HEIGHT * 8))
+        small = image.convert("L").resize((HASH_WIDTH + 1, HASH_HEIGHT), Image.Resampling.LANCZOS)
+        pixels = small.tobytes()  # One byte per pixel in "L" mode
+
+    value = 0
+    for row in range(HASH_HEIGHT):
+        for col in range(HASH_WIDTH):
+            left = pixels[row * (HASH_WIDTH + 1) + col]
+            right = pixels[row * (HASH_WIDTH + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_HASH_WORKERS)
+    return _pool
+
+
+async def image_hash(source: Union[str, bytes]) -> Optional[int]:
+    """dHash computed in the process pool, so decoding never blocks the event loop.
+
+    Returns None for anything Pillow can't decode.
+    """
+    global _pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), dhash, source)
+    except BrokenProcessPool:
+        # A pool process died (e.g. OOM on a huge image); start over next time
+        logging.warning("Image hash pool broke, restarting it")
+        _pool = None
+        return None
+    except Exception as e:
+        logging.info(f"Couldn't hash image: {e}")
+        return None
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & HASH_MASK).count("1")
+
+
+# Postgres has no unsigned 64-bit integer, hashes are stored as signed BIGINT
+
+def to_signed(value: int) -> int:
+    return value - (1 << HASH_BITS) if value >> (HASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value & HASH_MASK
+
+
+def hash_bands(value: int) -> List[int]:
+    value = to_unsigned(value)
+    return [(value >> (BAND_BITS * i)) & BAND_MASK for i in range(BANDS)]
+
+
+def hash_columns(value: Optional[int]) -> dict:
+    """posts.phash and posts.phash_band* values for a hash (or None)"""
+    if value is None:
+        return {"phash": None, **{f"phash_band{i}": None for i in range(BANDS)}}
+    return {"phash": to_signed(value), **{f"phash_band{i}": band for i, band in enumerate(hash_bands(value))}}
+
+
+def band_neighbours(band: int, radius: int) -> List[int]:
+    """All band values within `radius` bits of `band` (including itself)"""
+    values = [band]
+    for flips in range(1, radius + 1):
+        for bits in itertools.combinations(range(BAND_BITS), flips):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
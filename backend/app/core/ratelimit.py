@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import deque, defaultdict
+from typing import Hashable, Dict, Tuple
+from app.core.config import settings
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` stored."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens. Returns 0 on success, otherwise seconds until they'd be available."""
+        self._refill(time.monotonic())
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """Per-key token buckets with a separate budget per kind of work.
+
+    `check` rejects immediately (API), `acquire` waits for a token (bot ingestion).
+    Keys are arbitrary hashables, usually a user id.
+    """
+
+    # Forget buckets that have refilled completely once we track this many
+    PRUNE_THRESHOLD = 10_000
+
+    def __init__(self, budgets: Dict[str, Tuple[float, float]]):
+        self.budgets = budgets
+        self._buckets: Dict[Tuple[str, Hashable], TokenBucket] = {}
+        self._locks: Dict[Tuple[str, Hashable], asyncio.Lock] = {}
+        self.metrics = defaultdict(lambda: {"allowed": 0, "throttled": 0, "queued": 0, "queued_seconds": 0.0})
+
+    def _bucket(self, key: Hashable, budget: str) -> TokenBucket:
+        bucket = self._buckets.get((budget, key))
+        if bucket is None:
+            if len(self._buckets) >= self.PRUNE_THRESHOLD:
+                self._prune()
+            rate, burst = self.budgets[budget]
+            bucket = self._buckets[(budget, key)] = TokenBucket(rate, burst)
+        return bucket
+
+    def _prune(self):
+        for bucket_key in [k for k, b in self._buckets.items() if b.is_full()]:
+            del self._buckets[bucket_key]
+            lock = self._locks.get(bucket_key)
+            if lock is not None and not lock.locked():
+                del self._locks[bucket_key]
+
+    def check(self, key: Hashable, budget: str, cost: float = 1.0) -> float:
+        """Non-blocking admission. Returns 0 if allowed, otherwise the Retry-After in seconds."""
+        retry_after = self._bucket(key, budget).take(cost)
+        if retry_after:
+            self.metrics[budget]["throttled"] += 1
+        else:
+            self.metrics[budget]["allowed"] += 1
+        return retry_after
+
+    async def acquire(self, key: Hashable, budget: str, cost: float = 1.0):
+        """Wait until the key has budget. Waiters for the same key are served FIFO."""
+        bucket = self._bucket(key, budget)
+        lock = self._locks.get((budget, key))
+        if (lock is None or not lock.locked()) and bucket.take(cost) == 0:
+            self.metrics[budget]["allowed"] += 1
+            return
+
+        started = time.monotonic()
+        self.metrics[budget]["queued"] += 1
+        if lock is None:
+            lock = self._locks[(budget, key)] = asyncio.Lock()
+        async with lock:
+            while True:
+                wait = bucket.take(cost)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+        self.metrics[budget]["allowed"] += 1
+        self.metrics[budget]["queued_seconds"] += time.monotonic() - started
+
+    def stats(self) -> dict:
+        return {budget: dict(values) for budget, values in self.metrics.items()}
+
+
+class FairScheduler:
+    """Global concurrency cap with round-robin hand-off between keys.
+
+    A user with hundreds of queued messages only gets one slot per turn,
+    so other users' messages don't wait behind the whole backlog.
+    """
+
+    def __init__(self, concurrency: int):
+        self._free = concurrency
+        self._waiters: Dict[Hashable, deque] = {}
+        self._order: deque = deque()
+
+    async def acquire(self, key: Hashable):
+        if self._free > 0 and not self._order:
+            self._free -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if key not in self._waiters:
+            self._waiters[key] = deque()
+            self._order.append(key)
+        self._waiters[key].append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Slot was handed to us right before the cancellation: pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._order:
+            key = self._order.popleft()
+            waiters = self._waiters[key]
+            future = waiters.popleft()
+            if waiters:
+                self._order.append(key)
+            else:
+                del self._waiters[key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
+
+    def pending(self) -> int:
+        return sum(len(w) for w in self._waiters.values())
+
+
+# Budgets: (tokens per second, burst size)
+BUDGETS = {
+    "read": (settings.RATE_LIMIT_READ_RATE, settings.RATE_LIMIT_READ_BURST),
+    "write": (settings.RATE_LIMIT_WRITE_RATE, settings.RATE_LIMIT_WRITE_BURST),
+    "upload": (settings.RATE_LIMIT_UPLOAD_RATE, settings.RATE_LIMIT_UPLOAD_BURST),
+    "fetch": (settings.RATE_LIMIT_FETCH_RATE, settings.RATE_LIMIT_FETCH_BURST),
+}
+
+limiter = RateLimiter(BUDGETS)
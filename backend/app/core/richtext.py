@@ -0,0 +1,169 @@
+import html
+import json
+import re
+from typing import Optional, List, Union
+
+# Bump whenever the output of render_html changes, so stored posts get re-rendered
+RENDER_VERSION = 2
+
+SAFE_URL_SCHEMES = ("http://", "https://", "tg://", "mailto:", "tel:")
+
+# Links in text no entity covers (posts created through the API have none);
+# trailing punctuation is left out, as in "see https://example.com."
+BARE_URL = re.compile(r"https?://[^\s<>\"]*[^\s<>\".,;:!?'()\[\]]")
+
+# Simple formatting entities and the tags they map to
+SIMPLE_TAGS = {
+    "bold": ("<b>", "</b>"),
+    "italic": ("<i>", "</i>"),
+    "underline": ("<u>", "</u>"),
+    "strikethrough": ("<s>", "</s>"),
+    "spoiler": ('<span class="tg-spoiler">', "</span>"),
+    "code": ("<code>", "</code>"),
+    "blockquote": ("<blockquote>", "</blockquote>"),
+    "expandable_blockquote": ('<blockquote class="tg-expandable">', "</blockquote>"),
+    "hashtag": ('<span class="tg-hashtag">', "</span>"),
+    "cashtag": ('<span class="tg-cashtag">', "</span>"),
+    "bot_command": ('<span class="tg-command">', "</span>"),
+}
+
+
+def safe_href(url: str) -> Optional[str]:
+    """Return an attribute-escaped href, or None if the scheme isn't allowed"""
+    url = url.strip()
+    if not url:
+        return None
+    if not re.match(r"[a-zA-Z][a-zA-Z0-9+-]*:(?!\d)", url):
+        # Bare links like "example.com/page" (Telegram detects those as urls)
+        url = "http://" + url
+    if not url.lower().startswith(SAFE_URL_SCHEMES):
+        return None
+    return html.escape(url, quote=True)
+
+
+def _tags_for(entity: dict, entity_text: str):
+    """Opening and closing tag for an entity, or None to render it as plain text"""
+    kind = entity.get("type")
+
+    if kind in SIMPLE_TAGS:
+        return SIMPLE_TAGS[kind]
+
+    if kind == "pre":
+        language = re.sub(r"[^\w+-]", "", entity.get("language") or "")
+        if language:
+            return f'<pre><code class="language-{language}">', "</code></pre>"
+        return "<pre>", "</pre>"
+
+    href = None
+    if kind == "text_link":
+        href = safe_href(entity.get("url") or "")
+    elif kind == "url":
+        href = safe_href(entity_text)
+    elif kind == "email":
+        href = safe_href(f"mailto:{entity_text}")
+    elif kind == "phone_number":
+        href = safe_href("tel:" + re.sub(r"[^\d+]", "", entity_text))
+    elif kind == "mention":
+        username = entity_text.lstrip("@")
+        if re.fullmatch(r"\w+", username):
+            href = safe_href(f"https://t.me/{username}")
+    elif kind == "text_mention" and entity.get("user_id"):
+        href = safe_href(f"tg://user?id={int(entity['user_id'])}")
+
+    if href:
+        return link_tag(href), "</a>"
+    return None
+
+
+def link_tag(href: str) -> str:
+    return f'<a href="{href}" target="_blank" rel="noopener noreferrer">'
+
+
+def linkify(text: str) -> str:
+    """Escaped text with bare http(s) URLs turned into links"""
+    out = []
+    last = 0
+    for match in BARE_URL.finditer(text):
+        href = safe_href(match.group())
+        if not href:
+            continue
+        out.append(html.escape(text[last:match.start()], quote=False))
+        out.append(link_tag(href) + html.escape(match.group(), quote=False) + "</a>")
+        last = match.end()
+    out.append(html.escape(text[last:], quote=False))
+    return "".join(out)
+
+
+def render_html(text: Optional[str], entities: Union[str, List[dict], None]) -> Optional[str]:
+    """Render Telegram text + entities into sanitized HTML.
+
+    Offsets and lengths are in UTF-16 code units (as sent by Telegram).
+    Entities may nest; partially overlapping entities are split so the
+    output is always well-formed. All text is HTML-escaped and links are
+    restricted to SAFE_URL_SCHEMES. Bare URLs outside any entity are
+    linked as well.
+    """
+    if not text:
+        return None
+
+    if isinstance(entities, str):
+        try:
+            entities = json.loads(entities)
+        except ValueError:
+            entities = None
+
+    units = text.encode("utf-16-le")
+    total = len(units) // 2
+
+    def segment(start: int, end: int) -> str:
+        return units[start * 2:end * 2].decode("utf-16-le", errors="replace")
+
+    # Clip to the text and resolve tags up front
+    spans = []
+    for entity in entities or []:
+        try:
+            start = max(0, int(entity["offset"]))
+            end = min(total, start + int(entity["length"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if end <= start:
+            continue
+        tags = _tags_for(entity, segment(start, end))
+        if tags:
+            spans.append((start, end, tags))
+
+    # Outer (longer) entities open first at the same offset
+    spans.sort(key=lambda s: (s[0], -s[1]))
+
+    boundaries = sorted({0, total, *(s[0] for s in spans), *(s[1] for s in spans)})
+    out = []
+    stack = []  # open spans, innermost last
+    next_span = 0
+
+    for i, position in enumerate(boundaries):
+        # Close everything ending here. If a span that ends here isn't on top
+        # of the stack (overlap), close the ones above it and reopen them.
+        if any(s[1] == position for s in stack):
+            reopen = []
+            while stack:
+                span = stack.pop()
+                out.append(span[2][1])
+                if span[1] != position:
+                    reopen.append(span)
+                if not any(s[1] == position for s in stack):
+                    break
+            for span in reversed(reopen):
+                out.append(span[2][0])
+                stack.append(span)
+
+        while next_span < len(spans) and spans[next_span][0] == position:
+            span = spans[next_span]
+            out.append(span[2][0])
+            stack.append(span)
+            next_span += 1
+
+        if i + 1 < len(boundaries):
+            text_part = segment(position, boundaries[i + 1])
+            out.append(html.escape(text_part, quote=False) if stack else linkify(text_part))
+
+    return "".join(out)
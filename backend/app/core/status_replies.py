@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+
+# Links to the original messages listed in one status message
+MAX_LINKS = 3
+
+
+class Burst:
+    __slots__ = ("count", "too_large", "too_large_links", "duplicates", "last_item", "message_id", "shown", "lock", "edit_task")
+
+    def __init__(self):
+        self.count = 0
+        self.too_large = 0
+        self.too_large_links = []
+        self.duplicates = 0
+        self.last_item = time.monotonic()
+        self.message_id: Optional[int] = None
+        self.shown: Optional[str] = None
+        self.lock = asyncio.Lock()
+        self.edit_task: Optional[asyncio.Task] = None
+
+    def text(self) -> str:
+        saved = self.count - self.duplicates
+        if not saved:
+            text = "Already saved!" if self.duplicates == 1 else f"All {self.duplicates} items were already saved"
+        else:
+            text = "Saved!" if saved == 1 else f"Saved {saved} items"
+            if self.duplicates:
+                text += f"\nSkipped {self.duplicates} already saved"
+        if self.too_large:
+            text += (
+                "\nThe file is too large to store, it's only kept on Telegram."
+                if self.too_large == 1 else
+                f"\n{self.too_large} files are too large to store, they're only kept on Telegram."
+            )
+            # Known only for posts forwarded from a channel
+            links = self.too_large_links[:MAX_LINKS]
+            if links:
+                text += "\nOriginal: " + " ".join(links)
+        return text
+
+
+class StatusReplies:
+    """Acknowledge saved messages with one status message per burst.
+
+    The first message of a burst gets a reply; messages arriving after it
+    (albums, bulk forwards) edit that reply into "Saved N items", at most
+    once per edit_interval. A burst ends after idle_seconds without items.
+    """
+
+    # Forget finished bursts once we track this many chats
+    PRUNE_THRESHOLD = 1_000
+
+    def __init__(self, bot, idle_seconds: float, edit_interval: float):
+        self.bot = bot
+        self.idle_seconds = idle_seconds
+        self.edit_interval = edit_interval
+        self._bursts: Dict[int, Burst] = {}
+
+    async def saved(self, message, too_large: bool = False, duplicate: bool = False, source_url: Optional[str] = None):
+        chat_id = message.chat.id
+        now = time.monotonic()
+
+        burst = self._bursts.get(chat_id)
+        if burst is None or now - burst.last_item > self.idle_seconds:
+            if len(self._bursts) >= self.PRUNE_THRESHOLD:
+                self._prune(now)
+            burst = self._bursts[chat_id] = Burst()
+        burst.count += 1
+        burst.too_large += too_large
+        if too_large and source_url:
+            burst.too_large_links.append(source_url)
+        burst.duplicates += duplicate
+        burst.last_item = now
+
+        async with burst.lock:
+            if burst.message_id is None:
+                text = burst.text()
+                reply = await message.reply(text)
+                burst.message_id = reply.message_id
+                burst.shown = text
+
+        # Items counted while the first reply was in flight need an edit too
+        if burst.text() != burst.shown and (burst.edit_task is None or burst.edit_task.done()):
+            burst.edit_task = asyncio.create_task(self._edit(chat_id, burst))
+
+    async def _edit(self, chat_id: int, burst: Burst):
+        # Wait first, so everything arriving meanwhile lands in one edit
+        while burst.text() != burst.shown:
+            await asyncio.sleep(self.edit_interval)
+            text = burst.text()
+            try:
+                await self.bot.edit_message_text(text=text, chat_id=chat_id, message_id=burst.message_id)
+            except Exception as e:
+                # Deleted by the user, or not modified; not worth more requests
+                logging.info(f"Couldn't update status message in chat {chat_id}: {e}")
+                return
+            burst.shown = text
+
+    def _prune(self, now: float):
+        for chat_id in [c for c, b in self._bursts.items() if now - b.last_item > self.idle_seconds]:
+            del self._bursts[chat_id]
@@ -0,0 +1,92 @@
+import os
+import uuid
+from typing import BinaryIO, Optional
+from app.core.config import settings
+
+# Media files saved at ingest, served by the API under /static/images/
+MEDIA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "images")
+MEDIA_URL_PREFIX = "/static/images/"
+
+# Media kept on Telegram (only a file_id is stored), served by GET /media/{name}
+TELEGRAM_MEDIA_URL_PREFIX = "/media/"
+
+# Suffix of files that are still being written; renamed away once complete
+PARTIAL_SUFFIX = ".part"
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class QuotaExceeded(Exception):
+    """Saving a file would take the user over STORAGE_QUOTA_BYTES"""
+
+
+def media_url_for(filename: str) -> str:
+    return f"{MEDIA_URL_PREFIX}{filename}"
+
+
+def telegram_media_url(extension: str) -> str:
+    """New unguessable URL for a post whose media stays on Telegram"""
+    return f"{TELEGRAM_MEDIA_URL_PREFIX}{uuid.uuid4()}{extension}"
+
+
+def media_path(media_url: Optional[str]) -> Optional[str]:
+    """Local path for a media_url we store ourselves (None for anything else)"""
+    if not media_url or not media_url.startswith(MEDIA_URL_PREFIX):
+        return None
+    filename = media_url[len(MEDIA_URL_PREFIX):]
+    if not filename or "/" in filename or filename.startswith("."):
+        return None
+    return os.path.join(MEDIA_DIR, filename)
+
+
+def partial_path(filename: str) -> str:
+    """Where to write a file before it's complete (see finish_partial)"""
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    return os.path.join(MEDIA_DIR, filename + PARTIAL_SUFFIX)
+
+
+def finish_partial(filename: str) -> int:
+    """Atomically publish a completed partial file. Returns its size in bytes."""
+    final_path = os.path.join(MEDIA_DIR, filename)
+    os.replace(final_path + PARTIAL_SUFFIX, final_path)
+    return os.path.getsize(final_path)
+
+
+def discard_file(path: Optional[str]):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remaining_quota(used_bytes: int) -> Optional[int]:
+    """Bytes the user may still store, or None when quotas are disabled"""
+    if settings.STORAGE_QUOTA_BYTES is None:
+        return None
+    return max(0, settings.STORAGE_QUOTA_BYTES - (used_bytes or 0))
+
+
+def save_upload(source: BinaryIO, filename: str, limit: Optional[int]) -> int:
+    """Stream an upload into MEDIA_DIR, aborting once it exceeds `limit` bytes.
+
+    Writes to a partial file first so a failed or rejected upload never
+    leaves a truncated file behind under its final name.
+    """
+    path = partial_path(filename)
+    written = 0
+    try:
+        with open(path, "wb") as buffer:
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if limit is not None and written > limit:
+                    raise QuotaExceeded()
+                buffer.write(chunk)
+    except BaseException:
+        discard_file(path)
+        raise
+    return finish_partial(filename)
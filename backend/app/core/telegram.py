@@ -0,0 +1,51 @@
+from typing import BinaryIO, Optional, Union
+from app.core.config import settings
+
+# aiogram is imported inside the functions: the API only needs it once a
+# media file is fetched, and importing it up front slows down API startup
+
+
+class FileTooLarge(Exception):
+    """The Bot API won't hand out this file (over TELEGRAM_DOWNLOAD_LIMIT_BYTES)"""
+
+
+def create_bot(rate_share: float = 1.0):
+    """Bot client for BOT_TOKEN talking to TELEGRAM_API_URL, rate limited.
+
+    rate_share is the part of the global Bot API limit this process may use
+    (see TELEGRAM_API_RATE_SHARE); the pacing isn't shared between processes.
+    """
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from app.core.telegram_outbound import outbound_limiter
+
+    outbound_limiter.set_share(rate_share)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+    # Every API call this process makes with the token goes through the same pacing
+    session.middleware(outbound_limiter)
+    return Bot(token=settings.BOT_TOKEN, session=session)
+
+
+def is_too_large(file_size: Optional[int]) -> bool:
+    return file_size is not None and file_size > settings.TELEGRAM_DOWNLOAD_LIMIT_BYTES
+
+
+async def download_file(bot, file_id: str, destination: Union[str, BinaryIO]):
+    """Download a file by file_id into `destination` (a path or a binary file object)"""
+    from aiogram.exceptions import TelegramBadRequest
+    from app.core.telegram_outbound import outbound_limiter, PRIORITY_DOWNLOAD
+
+    try:
+        file = await bot.get_file(file_id)
+    except TelegramBadRequest as e:
+        # getFile answers "Bad Request: file is too big" past the download limit
+        if "too big" in e.message.lower():
+            raise FileTooLarge() from e
+        raise
+    if is_too_large(file.file_size):
+        raise FileTooLarge()
+
+    # Downloads aren't Bot API methods, so they're paced here
+    await outbound_limiter.acquire(PRIORITY_DOWNLOAD)
+    await bot.download_file(file.file_path, destination)
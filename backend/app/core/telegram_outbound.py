@@ -0,0 +1,139 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, Hashable, Optional
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetFile, GetUpdates
+from app.core.config import settings
+from app.core.ratelimit import RateLimiter, TokenBucket
+
+# Lower goes first when requests queue up for the global limit
+PRIORITY_DOWNLOAD = 0  # getFile and file downloads: someone is waiting for the media
+PRIORITY_DEFAULT = 1
+PRIORITY_CHAT = 2  # Replies, edits and anything else sent into a chat
+
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """Session middleware that paces every Bot API call this process makes.
+
+    Requests aimed at a chat wait for that chat's bucket first (FIFO per
+    chat), then all requests queue for the global bucket by priority, so a
+    burst of replies can't hold up media downloads. A 429 pauses the chat
+    (or everything, for requests without a chat) for retry_after seconds and
+    the request is retried, up to TELEGRAM_MAX_RETRIES times.
+    """
+
+    def __init__(self, rate: float, burst: float, chat_rate: float, chat_burst: float, max_retries: int):
+        self.rate = rate
+        self.burst = burst
+        self.global_bucket = TokenBucket(rate, burst)
+        self.chats = RateLimiter({"chat": (chat_rate, chat_burst)})
+        self.max_retries = max_retries
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self._chat_paused_until: Dict[Hashable, float] = {}
+        self.metrics = {"requests": 0, "queued": 0, "retry_after": 0}
+
+    def set_share(self, share: float):
+        """Only use `share` of the global limit.
+
+        Buckets live in process memory, so every process calling the Bot API
+        with the same token has to stick to its own part of the limit.
+        """
+        self.global_bucket = TokenBucket(self.rate * share, max(1.0, self.burst * share))
+
+    async def acquire(self, priority: int = PRIORITY_DEFAULT, chat_id: Optional[Hashable] = None):
+        """Wait for permission to make one request"""
+        self.metrics["requests"] += 1
+
+        if chat_id is not None:
+            paused = self._chat_paused_until.get(chat_id, 0) - time.monotonic()
+            if paused > 0:
+                await asyncio.sleep(paused)
+            self._chat_paused_until.pop(chat_id, None)
+            await self.chats.acquire(chat_id, "chat")
+
+        if not self._waiters and time.monotonic() >= self._paused_until and not self.global_bucket.take():
+            return
+
+        self.metrics["queued"] += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self):
+        """Hand out global tokens to queued requests, most urgent first"""
+        while self._waiters:
+            # Skip requests whose caller went away
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                break
+
+            paused = self._paused_until - time.monotonic()
+            if paused > 0:
+                await asyncio.sleep(paused)
+                continue
+            wait = self.global_bucket.take()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Cancelled while we slept; give the token back
+                self.global_bucket.tokens += 1
+            else:
+                future.set_result(None)
+
+    def pause(self, seconds: float, chat_id: Optional[Hashable] = None):
+        until = time.monotonic() + seconds
+        if chat_id is not None:
+            self._chat_paused_until[chat_id] = max(until, self._chat_paused_until.get(chat_id, 0))
+        else:
+            self._paused_until = max(until, self._paused_until)
+
+    async def __call__(self, make_request, bot, method):
+        # Long polling isn't throttled: it's how updates come in at all
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(method, GetFile):
+            priority = PRIORITY_DOWNLOAD
+        elif chat_id is not None:
+            priority = PRIORITY_CHAT
+        else:
+            priority = PRIORITY_DEFAULT
+
+        attempt = 0
+        while True:
+            await self.acquire(priority, chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.metrics["retry_after"] += 1
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logging.warning(
+                    f"Telegram flood limit on {type(method).__name__} (chat {chat_id}), "
+                    f"retrying in {e.retry_after}s ({attempt}/{self.max_retries})"
+                )
+                self.pause(e.retry_after, chat_id)
+
+
+outbound_limiter = OutboundLimiter(
+    settings.TELEGRAM_GLOBAL_RATE,
+    settings.TELEGRAM_GLOBAL_BURST,
+    settings.TELEGRAM_CHAT_RATE,
+    settings.TELEGRAM_CHAT_BURST,
+    settings.TELEGRAM_MAX_RETRIES,
+)
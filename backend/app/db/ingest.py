@@ -0,0 +1,50 @@
+import uuid
+from typing import List, Optional
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.models import Post
+
+
+# Posts are deduplicated on (user_id, ingest_key), so a redelivered Telegram
+# update or a retried upload inserts nothing the second time around.
+
+def telegram_ingest_key(chat_id: int, message_id: int) -> str:
+    # Telegram message ids are only unique within a chat
+    return f"tg:{chat_id}:{message_id}"
+
+
+def api_ingest_key(idempotency_key: Optional[str], index: int = 0) -> str:
+    """Key of the `index`-th post created by an API request.
+
+    Without a client Idempotency-Key every request gets a fresh key (so it
+    never collides, but a retry isn't recognised either).
+    """
+    if not idempotency_key:
+        return f"api:{uuid.uuid4()}"
+    return f"api:{idempotency_key}:{index}"
+
+
+async def insert_posts(db: AsyncSession, rows: List[dict]) -> List[Post]:
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING for a batch of posts.
+
+    Returns only the posts that were actually inserted, in the order of
+    `rows`; rows whose ingest key already exists for that user are skipped.
+    """
+    if not rows:
+        return []
+    result = await db.scalars(insert(Post).on_conflict_do_nothing().returning(Post), rows)
+    # RETURNING order isn't guaranteed for a multi-row insert (and rows are
+    # sent in several statements when their columns differ), while callers
+    # rely on the first post being the first row
+    order = {(row["user_id"], row.get("ingest_key")): index for index, row in enumerate(rows)}
+    return sorted(result.all(), key=lambda p: order.get((p.user_id, p.ingest_key), len(rows)))
+
+
+async def get_posts_by_ingest_keys(db: AsyncSession, user_id: int, keys: List[str]) -> List[Post]:
+    result = await db.execute(
+        select(Post).where(Post.user_id == user_id).where(Post.ingest_key.in_(keys))
+    )
+    posts = result.scalars().all()
+    order = {key: index for index, key in enumerate(keys)}
+    return sorted(posts, key=lambda p: order[p.ingest_key])
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from sqlalchemy.future import select
+from app.core.linkpreview import fetch_link_preview
+from app.db.base import AsyncSessionLocal
+from app.db.jobs import job_handler
+from app.db.models import Post
+from app.db.rerender import rerender_stale_posts
+from app.db.versions import bump_feed_versions
+
+# Handlers run by app/main_worker.py. Each takes the job payload, raises to
+# have the job retried, and must be safe to run more than once. Long work is
+# split up by returning the payload of a follow-up job (see complete_job).
+
+# Keeps one rerender job well within JOB_TIMEOUT_SECONDS
+RERENDER_BATCHES_PER_JOB = 50
+
+
+@job_handler("link_preview")
+async def link_preview_job(payload: dict):
+    """Attach an OpenGraph preview of payload["url"] to a freshly saved post"""
+    preview = await asyncio.to_thread(fetch_link_preview, payload["url"])
+    if not preview["title"] and not preview["image"]:
+        logging.info(f"No preview for {payload['url']}")
+        return
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Post).where(Post.id == payload["post_id"], Post.user_id == payload["user_id"])
+        )
+        post = result.scalar_one_or_none()
+        # Deleted since, or the client already sent its own preview
+        if post is None or post.link_preview:
+            return
+
+        post.link_preview = preview
+        await bump_feed_versions(session, post.user_id, [post.tab_id])
+        await session.commit()
+
+
+@job_handler("rerender_stale_posts")
+async def rerender_stale_posts_job(payload: dict):
+    _, last_id = await rerender_stale_posts(
+        after_id=payload.get("last_id", 0),
+        max_batches=RERENDER_BATCHES_PER_JOB,
+    )
+    if last_id is not None:
+        # More stale posts after this chunk: carry on from where it stopped
+        return {"last_id": last_id}
@@ -0,0 +1,213 @@
+"""Durable background jobs stored in the `jobs` table.
+
+Anything slow or retryable is enqueued here (in the same transaction as the
+change that needs it) and run by `python -m app.main_worker`:
+
+    await enqueue(db, "link_preview", {"post_id": ..., "url": ...})
+    await db.commit()
+
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+them can run side by side. A failed job is retried with exponential backoff
+until max_attempts, then dead-lettered (status 'dead') until retry_dead_jobs().
+Handlers are registered with @job_handler (see app/db/job_handlers.py) and
+must be idempotent: a job can run again after a worker crash or timeout.
+A handler may return a payload to continue in a follow-up job of the same
+kind, so long-running work is done in chunks that each fit the job timeout.
+"""
+import random
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import update, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.db.models import Job
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0  # A user is waiting to see the result
+PRIORITY_BACKGROUND = 10  # Maintenance, backfills
+
+JobHandler = Callable[[dict], Awaitable[Optional[dict]]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Optional[dict] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+    dedupe_key: Optional[str] = None,
+) -> Optional[int]:
+    """Add a job as part of the caller's transaction (it runs once committed).
+
+    Returns the job id, or None if a job with the same dedupe_key is
+    already pending or running.
+    """
+    result = await db.execute(
+        insert(Job)
+        .values(
+            kind=kind,
+            payload=payload or {},
+            priority=priority,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            run_at=func.now() + timedelta(seconds=delay),
+            dedupe_key=dedupe_key,
+        )
+        .on_conflict_do_nothing()
+        .returning(Job.id)
+    )
+    return result.scalar()
+
+
+async def enqueue_now(kind: str, payload: Optional[dict] = None, **options) -> Optional[int]:
+    """enqueue() in its own transaction, for callers that don't have one"""
+    async with AsyncSessionLocal() as session:
+        job_id = await enqueue(session, kind, payload, **options)
+        await session.commit()
+    return job_id
+
+
+async def claim_job(worker_id: str) -> Optional[Job]:
+    """Lock the next due job for `worker_id` and mark it running"""
+    async with AsyncSessionLocal() as session:
+        next_job = (
+            select(Job.id)
+            .where(Job.status == "pending")
+            .where(Job.run_at <= func.now())
+            .order_by(Job.priority, Job.run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await session.execute(
+            update(Job)
+            .where(Job.id == next_job)
+            .values(
+                status="running",
+                attempts=Job.attempts + 1,
+                locked_at=func.now(),
+                locked_by=worker_id,
+            )
+            .returning(Job)
+        )
+        job = result.scalar_one_or_none()
+        await session.commit()
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so failed jobs don't retry in lockstep"""
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def complete_job(job: Job, follow_up: Optional[dict] = None):
+    """Mark the job done, queueing `follow_up` as the payload of its continuation.
+
+    The continuation keeps the job's kind, priority and dedupe_key; it is
+    queued in the same transaction, once this job no longer holds the key.
+    """
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(Job)
+            .where(Job.id == job.id)
+            .values(status="done", finished_at=func.now(), locked_at=None, last_error=None)
+        )
+        if follow_up is not None:
+            await enqueue(
+                session, job.kind, follow_up,
+                priority=job.priority,
+                max_attempts=job.max_attempts,
+                dedupe_key=job.dedupe_key,
+            )
+        await session.commit()
+
+
+async def fail_job(job: Job, error: str, retry: bool = True):
+    """Schedule a retry, or dead-letter the job once it's out of attempts"""
+    if retry and job.attempts < job.max_attempts:
+        values = dict(
+            status="pending",
+            run_at=func.now() + timedelta(seconds=retry_delay(job.attempts)),
+        )
+    else:
+        values = dict(status="dead", finished_at=func.now())
+
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(Job)
+            .where(Job.id == job.id)
+            .values(locked_at=None, last_error=error[:4000], **values)
+        )
+        await session.commit()
+    return values["status"]
+
+
+async def requeue_stale_jobs() -> int:
+    """Put back jobs whose worker died (still 'running' past the job timeout)"""
+    cutoff = func.now() - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS + 60)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(Job)
+            .where(Job.status == "running")
+            .where(Job.locked_at < cutoff)
+            .values(
+                status=text("CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'dead' END"),
+                # Same as fail_job: dead-lettered jobs get a finished_at
+                finished_at=text("CASE WHEN attempts < max_attempts THEN NULL ELSE now() END"),
+                locked_at=None,
+                last_error="Worker stopped responding",
+            )
+            .returning(Job.id)
+        )
+        requeued = len(result.all())
+        await session.commit()
+    return requeued
+
+
+async def prune_finished_jobs() -> int:
+    cutoff = func.now() - timedelta(seconds=settings.JOB_RETENTION_SECONDS)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            delete(Job).where(Job.status == "done").where(Job.finished_at < cutoff)
+        )
+        await session.commit()
+    return result.rowcount
+
+
+async def retry_dead_jobs(kind: Optional[str] = None) -> int:
+    """Give dead-lettered jobs a fresh set of attempts.
+
+    Their dedupe_key is dropped, so they can't clash with a job queued since.
+    """
+    query = update(Job).where(Job.status == "dead")
+    if kind:
+        query = query.where(Job.kind == kind)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            query.values(status="pending", attempts=0, run_at=func.now(), finished_at=None, dedupe_key=None)
+        )
+        await session.commit()
+    return result.rowcount
+
+
+async def get_job_stats(db: AsyncSession) -> dict:
+    """Job counts per kind and status"""
+    result = await db.execute(
+        select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)
+    )
+    stats = {}
+    for kind, status, count in result.all():
+        stats.setdefault(kind, {})[status] = count
+    return stats
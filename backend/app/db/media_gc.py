@@ -0,0 +1,202 @@
+"""Reconcile MEDIA_DIR with posts.media_url and delete orphaned files.
+
+    python -m app.db.media_gc            # delete orphans older than the grace period
+    python -m app.db.media_gc --dry-run  # only report
+
+Both sides are walked as sorted streams and merged, so memory stays bounded
+no matter how many files / posts there are:
+
+  - the directory listing is sorted externally: names are collected in
+    fixed-size chunks, each chunk is sorted and spilled to a temp file, and
+    the chunk files are merged with heapq.merge
+  - posts are read with a server-side cursor ORDER BY media_url COLLATE "C"
+    (byte order, which matches Python's string order for UTF-8)
+
+Files without a post (including leftover partial downloads) are deleted once
+they are older than MEDIA_GC_GRACE_SECONDS, so the files of in-flight ingests
+aren't deleted before their posts are committed. While merging, missing
+posts.media_size values are filled from the file size, and finally
+users.storage_bytes is recomputed from posts.media_size, one user at a time
+with the user's row locked so that charges made meanwhile aren't lost.
+"""
+import argparse
+import asyncio
+import heapq
+import logging
+import os
+import tempfile
+import time
+from typing import Iterator, List, Tuple
+from sqlalchemy import text, update, bindparam
+from app.core.config import settings
+from app.core.storage import MEDIA_DIR, MEDIA_URL_PREFIX, discard_file
+from app.db.base import engine
+from app.db.models import Post
+
+CHUNK_SIZE = 100_000
+SIZE_UPDATE_BATCH = 1_000
+
+FileEntry = Tuple[str, int, float]  # name, size, mtime
+
+
+def _spill(entries: List[FileEntry], directory: str) -> str:
+    entries.sort()
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".chunk")
+    with os.fdopen(fd, "w", encoding="utf-8") as chunk:
+        for name, size, mtime in entries:
+            chunk.write(f"{name}\t{size}\t{mtime}\n")
+    return path
+
+
+def _read_chunk(path: str) -> Iterator[FileEntry]:
+    with open(path, encoding="utf-8") as chunk:
+        for line in chunk:
+            name, size, mtime = line.rstrip("\n").split("\t")
+            yield name, int(size), float(mtime)
+
+
+def sorted_media_files(directory: str, workdir: str, chunk_size: int = CHUNK_SIZE) -> Iterator[FileEntry]:
+    """Yield (name, size, mtime) of regular files in `directory`, sorted by name"""
+    chunk_paths = []
+    entries: List[FileEntry] = []
+
+    with os.scandir(directory) as listing:
+        for entry in listing:
+            # Names with tabs / newlines can't come from our uuid filenames
+            if "\t" in entry.name or "\n" in entry.name:
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            entries.append((entry.name, stat.st_size, stat.st_mtime))
+            if len(entries) >= chunk_size:
+                chunk_paths.append(_spill(entries, workdir))
+                entries = []
+
+    if entries:
+        chunk_paths.append(_spill(entries, workdir))
+
+    yield from heapq.merge(*(_read_chunk(path) for path in chunk_paths))
+
+
+async def sorted_post_media(conn):
+    """Yield (filename, post id, user id, media_size) for local media, sorted by filename"""
+    result = await conn.stream(
+        text(
+            "SELECT media_url, id, user_id, media_size FROM posts "
+            "WHERE media_url LIKE :prefix "
+            'ORDER BY media_url COLLATE "C"'
+        ).execution_options(yield_per=CHUNK_SIZE),
+        {"prefix": MEDIA_URL_PREFIX + "%"},
+    )
+    async for media_url, post_id, user_id, media_size in result:
+        yield media_url[len(MEDIA_URL_PREFIX):], post_id, user_id, media_size
+
+
+async def flush_sizes(sizes: list):
+    if not sizes:
+        return
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(Post.__table__)
+            .where(Post.__table__.c.id == bindparam("post_id"))
+            .where(Post.__table__.c.user_id == bindparam("owner_id"))
+            .values(media_size=bindparam("size")),
+            sizes,
+        )
+    sizes.clear()
+
+
+async def recompute_storage_usage():
+    async with engine.connect() as conn:
+        user_ids = (await conn.execute(text("SELECT id FROM users ORDER BY id"))).scalars().all()
+
+    for user_id in user_ids:
+        async with engine.begin() as conn:
+            # Lock first, sum afterwards: uploads and deletes change posts and
+            # then users.storage_bytes in one transaction, so once the lock is
+            # ours the sum sees either all or none of such a change (and the
+            # ones waiting behind us apply their delta on top of our total).
+            # A single UPDATE ... SET = (SELECT sum) would sum from a snapshot
+            # taken before waiting for the lock and undo a concurrent charge.
+            await conn.execute(text("SELECT 1 FROM users WHERE id = :user_id FOR UPDATE"), {"user_id": user_id})
+            await conn.execute(text(
+                "UPDATE users SET storage_bytes = usage.total FROM ("
+                "  SELECT coalesce(sum(media_size), 0) AS total FROM posts WHERE user_id = :user_id"
+                ") usage "
+                "WHERE users.id = :user_id AND users.storage_bytes <> usage.total"
+            ), {"user_id": user_id})
+
+
+async def collect_garbage(grace_seconds: int, dry_run: bool = False, chunk_size: int = CHUNK_SIZE) -> dict:
+    stats = {"files": 0, "orphans": 0, "orphan_bytes": 0, "deleted": 0, "missing": 0, "sizes_filled": 0}
+    cutoff = time.time() - grace_seconds
+    sizes = []
+
+    with tempfile.TemporaryDirectory(prefix="media-gc-") as workdir:
+        files = sorted_media_files(MEDIA_DIR, workdir, chunk_size)
+        current_file = next(files, None)
+        current_referenced = False
+
+        def advance():
+            """Move past the current file, deleting it if no post referenced it"""
+            nonlocal current_file, current_referenced
+            name, size, mtime = current_file
+            stats["files"] += 1
+            if not current_referenced and mtime <= cutoff:
+                stats["orphans"] += 1
+                stats["orphan_bytes"] += size
+                if not dry_run:
+                    discard_file(os.path.join(MEDIA_DIR, name))
+                    stats["deleted"] += 1
+            current_file = next(files, None)
+            current_referenced = False
+
+        async with engine.connect() as conn:
+            async for name, post_id, user_id, media_size in sorted_post_media(conn):
+                while current_file is not None and current_file[0] < name:
+                    advance()
+
+                if current_file is not None and current_file[0] == name:
+                    # Don't advance yet: several posts may share one file
+                    current_referenced = True
+                    if media_size is None and not dry_run:
+                        sizes.append({"post_id": post_id, "owner_id": user_id, "size": current_file[1]})
+                        stats["sizes_filled"] += 1
+                        if len(sizes) >= SIZE_UPDATE_BATCH:
+                            await flush_sizes(sizes)
+                else:
+                    stats["missing"] += 1
+
+        # Everything after the last referenced file
+        while current_file is not None:
+            advance()
+
+    if not dry_run:
+        await flush_sizes(sizes)
+        await recompute_storage_usage()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grace", type=int, default=settings.MEDIA_GC_GRACE_SECONDS, help="seconds")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stats = asyncio.run(collect_garbage(args.grace, args.dry_run))
+    print(
+        f"Scanned {stats['files']} files: {stats['orphans']} orphans "
+        f"({stats['orphan_bytes']} bytes, {stats['deleted']} deleted), "
+        f"{stats['missing']} posts point at missing files, "
+        f"{stats['sizes_filled']} media sizes filled in"
+    )
+
+
+if __name__ == "__main__":
+    main()
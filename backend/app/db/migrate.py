@@ -0,0 +1,205 @@
+import asyncio
+from typing import Optional
+from sqlalchemy import text
+from app.db.base import engine, Base
+import app.db.models  # noqa: F401  (registers tables on Base.metadata)
+
+# Schema migrations. Run once per deploy, before the API / bot start:
+#
+#   python -m app.db.migrate
+#
+# Kept out of the serving processes so replicas start accepting traffic
+# immediately instead of racing each other through DDL on every boot.
+#
+# Indexes on posts are built with CREATE INDEX CONCURRENTLY (see
+# create_index), so the API and bot keep writing while a migration runs.
+# Postgres can't do that for a partitioned posts table; there the build
+# locks out writes to posts until it's done, so run it in a maintenance
+# window (app/db/partition_posts.py creates the indexes of a fresh
+# partitioned table itself, which makes this a no-op).
+
+
+async def is_partitioned(table: str) -> bool:
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table})
+        return result.scalar() == "p"
+
+
+async def index_valid(name: str):
+    """True / False for an existing (in)valid index, None if there is none"""
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name})
+        return result.scalar()
+
+
+async def run_outside_transaction(statement: str):
+    # CREATE / DROP INDEX CONCURRENTLY refuse to run in a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(statement))
+
+
+async def drop_index(name: str, table: str):
+    concurrently = "" if await is_partitioned(table) else "CONCURRENTLY "
+    await run_outside_transaction(f"DROP INDEX {concurrently}IF EXISTS {name}")
+
+
+async def create_index(name: str, table: str, columns: str, unique: bool = False, where: Optional[str] = None):
+    """Build an index without blocking writes to the table (idempotent).
+
+    A concurrent build that fails half way (e.g. duplicates for a unique
+    index) leaves an INVALID index behind. It would still be maintained on
+    every write, and IF NOT EXISTS would skip it next time, so it's dropped
+    on failure (and before building, in case the migration was killed).
+    """
+    if await index_valid(name) is False:
+        print(f"Rebuilding invalid index '{name}'")
+        await drop_index(name, table)
+    concurrently = "" if await is_partitioned(table) else "CONCURRENTLY "
+    try:
+        await run_outside_transaction(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns})"
+            + (f" WHERE {where}" if where else "")
+        )
+    except Exception:
+        if await index_valid(name) is False:
+            await drop_index(name, table)
+        raise
+
+
+async def migrate():
+    """Create tables and apply additive column migrations (idempotent)"""
+    retries = 5
+    while retries > 0:
+        try:
+            # 1. Create Tables
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+            # 2. Migration: Tabs Position
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text("ALTER TABLE tabs ADD COLUMN position INTEGER DEFAULT 0"))
+                    print("Added 'position' column to 'tabs' table")
+            except Exception:
+                pass
+
+            # 3. Migration: Posts Link Preview
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text("ALTER TABLE posts ADD COLUMN link_preview JSON DEFAULT NULL"))
+                    print("Added 'link_preview' column to 'posts' table")
+            except Exception as e:
+                # Log explicitly to debug if it fails for other reasons
+                print(f"Migration warning (link_preview): {e}")
+
+            # 4. Migration: Version counters for conditional GETs
+            for table, column in (
+                ("users", "inbox_version"),
+                ("users", "tabs_version"),
+                ("tabs", "version"),
+            ):
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+                        print(f"Added '{column}' column to '{table}' table")
+                except Exception:
+                    pass
+
+            # 5. Migration: Pre-rendered rich text
+            for column, column_type in (("content_html", "TEXT"), ("render_version", "INTEGER")):
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(text(f"ALTER TABLE posts ADD COLUMN {column} {column_type} DEFAULT NULL"))
+                        print(f"Added '{column}' column to 'posts' table")
+                except Exception:
+                    pass
+
+            # 6. Migration: Composite feed index (also valid on partitioned posts)
+            await create_index("ix_posts_feed", "posts", "user_id, tab_id, position, created_at")
+
+            # 7. Migration: Storage accounting
+            for table, column, definition in (
+                ("users", "storage_bytes", "BIGINT NOT NULL DEFAULT 0"),
+                ("posts", "media_size", "BIGINT DEFAULT NULL"),
+            ):
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                        print(f"Added '{column}' column to '{table}' table")
+                except Exception:
+                    pass
+
+            # 8. Migration: Telegram file references for media fetched on first view
+            for column, definition in (
+                ("media_file_id", "VARCHAR DEFAULT NULL"),
+                ("media_file_unique_id", "VARCHAR DEFAULT NULL"),
+                ("media_meta", "JSON DEFAULT NULL"),
+            ):
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(text(f"ALTER TABLE posts ADD COLUMN {column} {definition}"))
+                        print(f"Added '{column}' column to 'posts' table")
+                except Exception:
+                    pass
+            await create_index("ix_posts_media_url", "posts", "media_url")
+
+            # 9. Migration: Per-user ingest keys instead of a global unique telegram_message_id
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text("ALTER TABLE posts ADD COLUMN ingest_key VARCHAR DEFAULT NULL"))
+                    print("Added 'ingest_key' column to 'posts' table")
+            except Exception:
+                pass
+            async with engine.connect() as conn:
+                result = await conn.execute(text(
+                    "SELECT indexdef FROM pg_indexes "
+                    "WHERE schemaname = current_schema() AND indexname = 'ix_posts_telegram_message_id'"
+                ))
+                indexdef = result.scalar()
+            # The replacement is built first so lookups by telegram_message_id
+            # always have an index; renamed into place once the old one is gone
+            if indexdef and indexdef.startswith("CREATE UNIQUE"):
+                await create_index("ix_posts_telegram_message_id_new", "posts", "telegram_message_id")
+                await drop_index("ix_posts_telegram_message_id", "posts")
+                print("Dropped unique constraint on 'posts.telegram_message_id'")
+            if await index_valid("ix_posts_telegram_message_id_new") and await index_valid("ix_posts_telegram_message_id") is None:
+                async with engine.begin() as conn:
+                    await conn.execute(text("ALTER INDEX ix_posts_telegram_message_id_new RENAME TO ix_posts_telegram_message_id"))
+            try:
+                await create_index("ix_posts_ingest_key", "posts", "user_id, ingest_key", unique=True)
+            except Exception as e:
+                # Duplicate keys from before ingest_key was enforced
+                print(f"Migration warning (ingest_key): {e}")
+
+            # 10. Migration: Perceptual image hashes for near-duplicate lookups
+            for column, definition in (
+                ("phash", "BIGINT DEFAULT NULL"),
+                ("phash_band0", "INTEGER DEFAULT NULL"),
+                ("phash_band1", "INTEGER DEFAULT NULL"),
+                ("phash_band2", "INTEGER DEFAULT NULL"),
+                ("phash_band3", "INTEGER DEFAULT NULL"),
+            ):
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(text(f"ALTER TABLE posts ADD COLUMN {column} {definition}"))
+                        print(f"Added '{column}' column to 'posts' table")
+                except Exception:
+                    pass
+            for band in range(4):
+                await create_index(
+                    f"ix_posts_phash_band{band}", "posts", f"user_id, phash_band{band}",
+                    where=f"phash_band{band} IS NOT NULL",
+                )
+            
+            break
+        except Exception as e:
+            retries -= 1
+            print(f"Database not ready, retrying in 2s... ({retries} left)")
+            await asyncio.sleep(2)
+            if retries == 0:
+                raise e
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
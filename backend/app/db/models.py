@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, BigInteger, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, BigInteger, ForeignKey, Index
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -10,6 +10,10 @@ class User(Base):
     telegram_id = Column(BigInteger, unique=True, index=True)
     username = Column(String, nullable=True)
     first_name = Column(String, nullable=True)
+    # Bumped on every change to the Inbox feed / tab list (used for ETags)
+    inbox_version = Column(Integer, default=0, server_default="0", nullable=False)
+    tabs_version = Column(Integer, default=0, server_default="0", nullable=False)
+    storage_bytes = Column(BigInteger, default=0, server_default="0", nullable=False)  # Sum of posts.media_size
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     posts = relationship("Post", back_populates="owner")
@@ -30,16 +34,44 @@ class AuthSession(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Feed query: WHERE user_id = ? AND tab_id ... ORDER BY position, created_at
+        Index("ix_posts_feed", "user_id", "tab_id", "position", "created_at"),
+        # GET /media/{name} looks the post up by its media_url
+        Index("ix_posts_media_url", "media_url"),
+        # Idempotent ingestion: INSERT ... ON CONFLICT DO NOTHING (see app/db/ingest.py)
+        Index("ix_posts_ingest_key", "user_id", "ingest_key", unique=True),
+        # Near-duplicate lookups probe each band of the perceptual hash (see app/db/similar.py)
+        Index("ix_posts_phash_band0", "user_id", "phash_band0", postgresql_where=text("phash_band0 IS NOT NULL")),
+        Index("ix_posts_phash_band1", "user_id", "phash_band1", postgresql_where=text("phash_band1 IS NOT NULL")),
+        Index("ix_posts_phash_band2", "user_id", "phash_band2", postgresql_where=text("phash_band2 IS NOT NULL")),
+        Index("ix_posts_phash_band3", "user_id", "phash_band3", postgresql_where=text("phash_band3 IS NOT NULL")),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    telegram_message_id = Column(Integer, unique=True, index=True)
+    # user_id is part of the primary key so the UPDATE/DELETE statements the
+    # ORM emits always carry the partition key when posts is hash-partitioned
+    # by user (see app/db/partition_posts.py)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    telegram_message_id = Column(Integer, index=True)  # Only unique per chat, see ingest_key
+    ingest_key = Column(String, nullable=True)  # "tg:<chat id>:<message id>" or "api:<Idempotency-Key>:<n>"
     content = Column(Text, nullable=True)
     entities = Column(Text, nullable=True)  # JSON string of message entities
+    content_html = Column(Text, nullable=True)  # Sanitized HTML pre-rendered from content + entities
+    render_version = Column(Integer, nullable=True)  # richtext.RENDER_VERSION used for content_html
     source_url = Column(String, nullable=True)  # Original post URL if forwarded
     media_url = Column(String, nullable=True)
     media_type = Column(String, nullable=True)
+    media_size = Column(BigInteger, nullable=True)  # Bytes of the local media file
+    media_file_id = Column(String, nullable=True)  # Telegram file_id, fetched on first view
+    media_file_unique_id = Column(String, nullable=True)  # Stable across bots / re-sends, keys the cache
+    media_meta = Column(JSON, nullable=True)  # Telegram file_size, mime_type, width, height, duration
     media_group_id = Column(String, nullable=True)
+    phash = Column(BigInteger, nullable=True)  # Perceptual hash of the image (app/core/phash.py), signed
+    phash_band0 = Column(Integer, nullable=True)  # 16-bit slices of phash, indexed for near-duplicate lookups
+    phash_band1 = Column(Integer, nullable=True)
+    phash_band2 = Column(Integer, nullable=True)
+    phash_band3 = Column(Integer, nullable=True)
     link_preview = Column(JSON, nullable=True)
     tab_id = Column(Integer, ForeignKey("tabs.id"), nullable=True)
     position = Column(Integer, default=0, index=True)
@@ -57,7 +89,38 @@ class Tab(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     title = Column(String, index=True)
     position = Column(Integer, default=0, index=True)
+    # Bumped on every change to the posts inside this tab (used for ETags)
+    version = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     owner = relationship("User", back_populates="tabs")
     posts = relationship("Post", back_populates="tab")
+
+
+class Job(Base):
+    """Durable background job, see app/db/jobs.py and app/main_worker.py"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim query: WHERE status = 'pending' AND run_at <= now() ORDER BY priority, run_at
+        Index("ix_jobs_claim", "priority", "run_at", postgresql_where=text("status = 'pending'")),
+        # At most one queued / running job per dedupe_key
+        Index(
+            "ix_jobs_dedupe_key", "dedupe_key", unique=True,
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    priority = Column(Integer, default=0, server_default="0", nullable=False)  # Lower runs first
+    status = Column(String, default="pending", server_default="pending", nullable=False)  # pending, running, done, dead
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Not before (backoff)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String, nullable=True)  # Worker that claimed it
+    last_error = Column(Text, nullable=True)
+    dedupe_key = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
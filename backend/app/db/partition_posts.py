@@ -0,0 +1,247 @@
+"""Convert `posts` into a table hash-partitioned by user, without downtime.
+
+    python -m app.db.partition_posts --partitions 16
+
+Only hash partitioning on user_id is supported: the Post primary key is
+(id, user_id), so every UPDATE / DELETE the ORM emits carries the partition
+key and gets pruned, and the unique (user_id, ingest_key) index that makes
+ingestion idempotent (app/db/ingest.py) can exist on the partitioned table.
+Range partitioning on created_at would give up both.
+
+How it works:
+  1. `posts_new` is created with the same columns and defaults (it keeps using
+     the posts id sequence), partitioned and indexed.
+  2. A row trigger on `posts` mirrors every insert / update / delete into
+     `posts_new` from then on.
+  3. Existing rows are copied in id batches, each batch in its own short
+     transaction. The source rows are locked FOR SHARE while they are copied so a
+     concurrent update / delete waits and its trigger sees the copied row.
+  4. The tables are swapped in one transaction (a brief ACCESS EXCLUSIVE lock).
+     The old table is kept as `posts_unpartitioned` unless --drop-old is given.
+
+The script can be re-run after an interruption: it reuses `posts_new` and the
+copy skips rows that are already there.
+
+Measured with scripts/bench_partitioning.py on a small box (PostgreSQL 16,
+1 CPU, 5 GB RAM; 10M posts, 100k users, 16 partitions, 500 samples):
+
+                 plain p50 / p95        hash p50 / p95
+    feed         2.92 / 7.44 ms         2.77 / 4.26 ms
+    reorder     10.16 / 17.84 ms        9.01 / 12.90 ms
+    delete       0.95 / 2.67 ms         1.09 / 2.30 ms
+
+Medians are within noise, only the p95 tail improves; at 1M posts hash was
+slightly slower (feed 2.01 vs 1.87 ms). Not worth the migration until posts
+is well past 10M rows; re-run the benchmark on production-like hardware and
+data before converting.
+"""
+import argparse
+import asyncio
+from sqlalchemy import text
+from app.db.base import engine
+
+NEW_TABLE = "posts_new"
+OLD_TABLE = "posts_unpartitioned"
+
+
+PARTITION_KEY = "user_id"
+
+
+async def is_partitioned(conn, table: str = "posts") -> bool:
+    result = await conn.execute(text(
+        "SELECT c.relkind = 'p' FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = :table AND n.nspname = current_schema()"
+    ), {"table": table})
+    return bool(result.scalar())
+
+
+async def table_exists(conn, table: str) -> bool:
+    result = await conn.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table})
+    return bool(result.scalar())
+
+
+async def post_columns(conn) -> list:
+    result = await conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = 'posts' AND table_schema = current_schema() "
+        "ORDER BY ordinal_position"
+    ))
+    return list(result.scalars().all())
+
+
+async def create_partitioned_table(conn, partitions: int):
+    key = PARTITION_KEY
+
+    # Same columns and defaults as posts (id keeps using the posts sequence)
+    await conn.execute(text(
+        f"CREATE TABLE {NEW_TABLE} (LIKE posts INCLUDING DEFAULTS) PARTITION BY HASH ({key})"
+    ))
+    await conn.execute(text(f"ALTER TABLE {NEW_TABLE} ALTER COLUMN {key} SET NOT NULL"))
+    # Unique constraints on a partitioned table must include the partition key
+    await conn.execute(text(f"ALTER TABLE {NEW_TABLE} ADD PRIMARY KEY (id, {key})"))
+    await conn.execute(text(
+        f"ALTER TABLE {NEW_TABLE} ADD FOREIGN KEY (user_id) REFERENCES users (id)"
+    ))
+    await conn.execute(text(
+        f"ALTER TABLE {NEW_TABLE} ADD FOREIGN KEY (tab_id) REFERENCES tabs (id)"
+    ))
+
+    for remainder in range(partitions):
+        await conn.execute(text(
+            f"CREATE TABLE {NEW_TABLE}_p{remainder} PARTITION OF {NEW_TABLE} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        ))
+
+    # Indexes are created on every partition; names are swapped along with the table
+    for name, columns in (
+        ("feed", "user_id, tab_id, position, created_at"),
+        ("id", "id"),
+        ("telegram_message_id", "telegram_message_id"),
+        ("media_group_id", "user_id, media_group_id"),
+        ("media_url", "media_url"),
+    ):
+        await conn.execute(text(f"CREATE INDEX ix_{NEW_TABLE}_{name} ON {NEW_TABLE} ({columns})"))
+    for band in range(4):
+        await conn.execute(text(
+            f"CREATE INDEX ix_{NEW_TABLE}_phash_band{band} ON {NEW_TABLE} (user_id, phash_band{band}) "
+            f"WHERE phash_band{band} IS NOT NULL"
+        ))
+
+    await conn.execute(text(f"CREATE UNIQUE INDEX ix_{NEW_TABLE}_ingest_key ON {NEW_TABLE} (user_id, ingest_key)"))
+
+
+async def install_sync_trigger(conn, columns: list):
+    key = PARTITION_KEY
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in ("id", key))
+    await conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION posts_partition_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.{key} IS DISTINCT FROM NEW.{key}) THEN
+                DELETE FROM {NEW_TABLE} WHERE id = OLD.id AND {key} = OLD.{key};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {NEW_TABLE} SELECT (NEW).*
+                ON CONFLICT (id, {key}) DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    await conn.execute(text("DROP TRIGGER IF EXISTS posts_partition_sync ON posts"))
+    await conn.execute(text(
+        "CREATE TRIGGER posts_partition_sync AFTER INSERT OR UPDATE OR DELETE ON posts "
+        "FOR EACH ROW EXECUTE FUNCTION posts_partition_sync()"
+    ))
+
+
+async def backfill(batch_size: int, pause: float):
+    key = PARTITION_KEY
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT coalesce(max(id), 0) FROM posts"))
+        max_id = result.scalar()
+
+    copied = 0
+    last_id = 0
+    while last_id < max_id:
+        upper = last_id + batch_size
+        async with engine.begin() as conn:
+            result = await conn.execute(text(
+                f"INSERT INTO {NEW_TABLE} "
+                f"SELECT * FROM posts WHERE id > :lower AND id <= :upper AND {key} IS NOT NULL "
+                f"FOR SHARE "
+                f"ON CONFLICT DO NOTHING"
+            ), {"lower": last_id, "upper": upper})
+            copied += result.rowcount
+        last_id = upper
+        print(f"Copied up to id {min(last_id, max_id)} / {max_id} ({copied} rows)")
+        await asyncio.sleep(pause)
+
+
+async def swap(drop_old: bool):
+    async with engine.begin() as conn:
+        await conn.execute(text("LOCK TABLE posts IN ACCESS EXCLUSIVE MODE"))
+
+        result = await conn.execute(text(
+            f"SELECT (SELECT count(*) FROM posts WHERE {PARTITION_KEY} IS NOT NULL), "
+            f"(SELECT count(*) FROM {NEW_TABLE})"
+        ))
+        old_count, new_count = result.one()
+        if old_count != new_count:
+            raise RuntimeError(f"Row count mismatch: posts={old_count}, {NEW_TABLE}={new_count}; re-run to resume")
+
+        result = await conn.execute(text("SELECT pg_get_serial_sequence('posts', 'id')"))
+        sequence = result.scalar()
+
+        await conn.execute(text("DROP TRIGGER posts_partition_sync ON posts"))
+        await conn.execute(text("DROP FUNCTION posts_partition_sync()"))
+        await conn.execute(text(f"ALTER TABLE posts RENAME TO {OLD_TABLE}"))
+        await conn.execute(text(f"ALTER TABLE {NEW_TABLE} RENAME TO posts"))
+        if sequence:
+            # Otherwise dropping the old table would drop the sequence with it
+            await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY posts.id"))
+
+        # Move the old table's index names out of the way and take them over
+        result = await conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :table AND schemaname = current_schema()"
+        ), {"table": OLD_TABLE})
+        for index in result.scalars().all():
+            if index.startswith("ix_posts_"):
+                await conn.execute(text(f"ALTER INDEX {index} RENAME TO {index.replace('ix_posts_', f'ix_{OLD_TABLE}_', 1)}"))
+        result = await conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'posts' AND schemaname = current_schema()"
+        ))
+        for index in result.scalars().all():
+            if index.startswith(f"ix_{NEW_TABLE}_"):
+                await conn.execute(text(f"ALTER INDEX {index} RENAME TO {index.replace(f'ix_{NEW_TABLE}_', 'ix_posts_', 1)}"))
+
+        # posts_new_p0 -> posts_p0, ...
+        result = await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'posts'::regclass"
+        ))
+        for partition in result.scalars().all():
+            if partition.startswith(f"{NEW_TABLE}_"):
+                await conn.execute(text(f"ALTER TABLE {partition} RENAME TO {partition.replace(NEW_TABLE, 'posts', 1)}"))
+
+        if drop_old:
+            await conn.execute(text(f"DROP TABLE {OLD_TABLE}"))
+
+    print("posts is now partitioned" + ("" if drop_old else f"; previous table kept as {OLD_TABLE}"))
+
+
+async def partition_posts(partitions: int, batch_size: int, pause: float, drop_old: bool):
+    async with engine.begin() as conn:
+        if await is_partitioned(conn):
+            print("posts is already partitioned")
+            return
+
+        result = await conn.execute(text(f"SELECT count(*) FROM posts WHERE {PARTITION_KEY} IS NULL"))
+        skipped = result.scalar()
+        if skipped:
+            print(f"Warning: {skipped} posts have NULL {PARTITION_KEY} and will not be copied")
+
+        if not await table_exists(conn, NEW_TABLE):
+            await create_partitioned_table(conn, partitions)
+            print(f"Created {NEW_TABLE} ({partitions} hash partitions)")
+
+        # Mirror writes from now on, so the batched copy below can't miss anything
+        await install_sync_trigger(conn, await post_columns(conn))
+
+    await backfill(batch_size, pause)
+    await swap(drop_old)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--partitions", type=int, default=16, help="number of hash partitions")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="rows (ids) copied per transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--drop-old", action="store_true", help="drop the unpartitioned table after the swap")
+    args = parser.parse_args()
+
+    asyncio.run(partition_posts(args.partitions, args.batch_size, args.pause, args.drop_old))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.future import select
+from app.core.richtext import render_html, RENDER_VERSION
+from app.db.base import AsyncSessionLocal
+from app.db.models import Post
+from app.db.versions import bump_feed_versions
+
+
+async def rerender_stale_posts(
+    batch_size: int = 500,
+    pause: float = 0.1,
+    after_id: int = 0,
+    max_batches: Optional[int] = None,
+) -> Tuple[int, Optional[int]]:
+    """Re-render content_html for posts rendered by an older RENDER_VERSION.
+
+    Walks the table in id order (from after_id) in small batches, one
+    transaction each, so it can run in the background of a live process.
+    Feed versions of every touched feed are bumped so clients don't keep
+    serving the old HTML from cache.
+
+    Stops after max_batches batches if given. Returns the number of
+    re-rendered posts and the last id handled, or None for the last id once
+    no stale posts are left.
+    """
+    last_id = after_id
+    total = 0
+    batches = 0
+
+    while True:
+        if max_batches is not None and batches >= max_batches:
+            return total, last_id
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Post)
+                .where(Post.id > last_id)
+                .where(Post.user_id.is_not(None))
+                .where(or_(Post.render_version.is_(None), Post.render_version < RENDER_VERSION))
+                .order_by(Post.id.asc())
+                .limit(batch_size)
+            )
+            posts = result.scalars().all()
+            if not posts:
+                break
+
+            touched = {}
+            for post in posts:
+                post.content_html = render_html(post.content, post.entities)
+                post.render_version = RENDER_VERSION
+                touched.setdefault(post.user_id, set()).add(post.tab_id)
+
+            for user_id, tab_ids in touched.items():
+                await bump_feed_versions(session, user_id, tab_ids)
+
+            await session.commit()
+
+            last_id = posts[-1].id
+            total += len(posts)
+            batches += 1
+
+        # Leave room for request traffic between batches
+        await asyncio.sleep(pause)
+
+    if total:
+        logging.info(f"Re-rendered {total} posts to render version {RENDER_VERSION}")
+    return total, None
@@ -0,0 +1,74 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.phash import BANDS, band_neighbours, hash_bands, hamming, to_unsigned
+from app.db.models import Post
+
+# Near-duplicate lookup by multi-index hashing. posts.phash is split into
+# BANDS 16-bit bands, each with its own (user_id, band) index. Two hashes
+# within d bits of each other differ by at most d // BANDS bits in at least
+# one band (pigeonhole), so the candidates are the posts matching one of
+# each band's small neighbourhood, found with index scans; only those get
+# the exact Hamming distance check instead of every image of the user.
+
+BAND_COLUMNS = [Post.phash_band0, Post.phash_band1, Post.phash_band2, Post.phash_band3]
+
+# Columns a post linked to an earlier copy of its image takes over from it
+LINKED_MEDIA_FIELDS = ("media_url", "media_type", "media_file_id", "media_file_unique_id", "media_meta")
+
+
+async def find_similar(
+    db: AsyncSession,
+    user_id: int,
+    phash: int,
+    max_distance: int,
+    limit: Optional[int] = None,
+    exclude_id: Optional[int] = None,
+) -> List[Tuple[Post, int]]:
+    """(post, distance) for the user's images within max_distance bits of phash, closest first"""
+    radius = max_distance // BANDS
+    probes = [
+        column.in_(band_neighbours(band, radius))
+        for column, band in zip(BAND_COLUMNS, hash_bands(phash))
+    ]
+    query = select(Post.id, Post.phash).where(Post.user_id == user_id).where(or_(*probes))
+    if exclude_id is not None:
+        query = query.where(Post.id != exclude_id)
+    result = await db.execute(query)
+
+    phash = to_unsigned(phash)
+    distances = {}
+    for post_id, candidate in result.all():
+        distance = hamming(phash, to_unsigned(candidate))
+        if distance <= max_distance:
+            distances[post_id] = distance
+    # Oldest post first among equally close ones: that's the original
+    closest = sorted(distances, key=lambda post_id: (distances[post_id], post_id))[:limit]
+    if not closest:
+        return []
+
+    result = await db.execute(select(Post).where(Post.user_id == user_id).where(Post.id.in_(closest)))
+    posts = {post.id: post for post in result.scalars().all()}
+    return [(posts[post_id], distances[post_id]) for post_id in closest if post_id in posts]
+
+
+async def find_duplicate(db: AsyncSession, user_id: int, phash: Optional[int]) -> Optional[Post]:
+    """Earlier post of the user with (nearly) the same image, if any"""
+    if phash is None:
+        return None
+    matches = await find_similar(db, user_id, phash, settings.DUPLICATE_IMAGE_MAX_DISTANCE, limit=1)
+    return matches[0][0] if matches else None
+
+
+def link_to(row: dict, original: Post) -> dict:
+    """Post row pointing at the stored media of `original` instead of its own copy.
+
+    The linked post doesn't add to the user's storage (media_size 0): the
+    bytes are accounted to the original.
+    """
+    linked = dict(row, media_size=0)
+    for field in LINKED_MEDIA_FIELDS:
+        linked[field] = getattr(original, field)
+    return linked
@@ -0,0 +1,99 @@
+import logging
+from typing import Iterable, Optional
+from sqlalchemy import update, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.storage import media_path, discard_file
+from app.db.models import User, Post
+
+
+# Per-user storage accounting. Counters are changed in the same transaction
+# as the posts they describe; `python -m app.db.media_gc` reconciles them.
+
+async def get_storage_used(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(select(User.storage_bytes).where(User.id == user_id))
+    return result.scalar_one_or_none() or 0
+
+
+async def add_storage_used(db: AsyncSession, user_id: int, delta: int):
+    if not delta:
+        return
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(storage_bytes=User.storage_bytes + delta)
+    )
+
+
+async def charge_storage(db: AsyncSession, user_id: int, delta: int) -> bool:
+    """Add `delta` bytes to the user's usage unless that would exceed the quota.
+
+    The check and the increment are one conditional UPDATE, so concurrent
+    uploads that each fit the remaining quota on their own can't both be
+    charged past it (the row lock makes the second one see the first's
+    total). Returns False, charging nothing, when the quota doesn't allow it.
+    """
+    quota: Optional[int] = settings.STORAGE_QUOTA_BYTES
+    if not delta or quota is None:
+        await add_storage_used(db, user_id, delta)
+        return True
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .where(User.storage_bytes + delta <= quota)
+        .values(storage_bytes=User.storage_bytes + delta)
+        .returning(User.storage_bytes)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def hand_over_media_sizes(db: AsyncSession, user_id: int, deleted) -> int:
+    """Charge the files of deleted posts to a surviving post that links to them.
+
+    `deleted` are (media_url, media_size) rows of posts just deleted in this
+    transaction. Posts linked to an earlier copy of an image (see
+    app/db/similar.py) store media_size 0, so when the post that paid for a
+    shared file goes, the oldest remaining reference takes its size over.
+    Returns the bytes handed over (still in use, not to be subtracted).
+    """
+    handed_over = 0
+    for media_url, media_size in deleted:
+        if not media_size or not media_path(media_url):
+            continue
+        result = await db.execute(
+            select(Post.id)
+            .where(Post.user_id == user_id)
+            .where(Post.media_url == media_url)
+            .order_by(Post.id.asc())
+            .limit(1)
+        )
+        heir_id = result.scalar_one_or_none()
+        if heir_id is None:
+            continue
+        await db.execute(
+            update(Post)
+            .where(Post.id == heir_id, Post.user_id == user_id)
+            .values(media_size=func.coalesce(Post.media_size, 0) + media_size)
+        )
+        handed_over += media_size
+    return handed_over
+
+
+async def unlink_unreferenced_media(db: AsyncSession, media_urls: Iterable[str]):
+    """Delete files of removed posts unless another post still points at them.
+
+    Call after the deleting transaction has committed. Anything missed here
+    (crash, shared file raced with a new reference) is caught by the media GC.
+    """
+    media_urls = {url for url in media_urls if media_path(url)}
+    if not media_urls:
+        return
+
+    result = await db.execute(select(Post.media_url).where(Post.media_url.in_(media_urls)).distinct())
+    still_referenced = set(result.scalars().all())
+
+    for url in media_urls - still_referenced:
+        try:
+            discard_file(media_path(url))
+        except OSError as e:
+            logging.warning(f"Failed to delete media file {url}: {e}")
@@ -0,0 +1,74 @@
+from typing import Iterable, Optional
+from sqlalchemy import update, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import User, Tab, Post
+
+
+# Version counters for conditional GETs.
+#
+# Every feed the client can request (the Inbox, each tab, and the tab list)
+# has its own counter. Mutations bump the counters of the feeds they touch in
+# the same transaction as the change itself, so GET handlers can answer
+# If-None-Match by reading a single integer instead of the posts table.
+
+async def bump_feed_versions(db: AsyncSession, user_id: int, tab_ids: Iterable[Optional[int]]):
+    """Bump the version of every feed in tab_ids (None means the Inbox)."""
+    tab_ids = set(tab_ids)
+
+    if None in tab_ids:
+        await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(inbox_version=User.inbox_version + 1)
+        )
+        tab_ids.discard(None)
+
+    if tab_ids:
+        await db.execute(
+            update(Tab)
+            .where(Tab.id.in_(tab_ids))
+            .where(Tab.user_id == user_id)
+            .values(version=Tab.version + 1)
+        )
+
+
+async def bump_tabs_version(db: AsyncSession, user_id: int):
+    """Bump the version of the user's tab list."""
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(tabs_version=User.tabs_version + 1)
+    )
+
+
+async def get_post_tab_ids(db: AsyncSession, user_id: int, post_ids: Iterable[int]) -> set:
+    """Return the set of feeds (tab ids, None for Inbox) the given posts live in."""
+    result = await db.execute(
+        select(Post.tab_id)
+        .where(Post.user_id == user_id)
+        .where(Post.id.in_(list(post_ids)))
+        .distinct()
+    )
+    return set(result.scalars().all())
+
+
+async def get_feed_etag(db: AsyncSession, user_id: int, tab_id: Optional[int]) -> Optional[str]:
+    """Weak ETag for GET /posts, or None if the feed has no version (unknown tab)."""
+    if tab_id is None:
+        result = await db.execute(select(User.inbox_version).where(User.id == user_id))
+        version = result.scalar_one_or_none()
+        return f'W/"u{user_id}-inbox-{version}"' if version is not None else None
+
+    result = await db.execute(
+        select(Tab.version).where(Tab.id == tab_id).where(Tab.user_id == user_id)
+    )
+    version = result.scalar_one_or_none()
+    return f'W/"u{user_id}-t{tab_id}-{version}"' if version is not None else None
+
+
+async def get_tabs_etag(db: AsyncSession, user_id: int) -> Optional[str]:
+    """Weak ETag for GET /tabs."""
+    result = await db.execute(select(User.tabs_version).where(User.id == user_id))
+    version = result.scalar_one_or_none()
+    return f'W/"u{user_id}-tabs-{version}"' if version is not None else None
+
@@ -1,29 +1,69 @@
 import asyncio
+import io
 import logging
-import os
-import uuid
 import json
-from aiogram import Bot, Dispatcher, types
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from aiogram import Dispatcher, BaseMiddleware, types
 from aiogram.filters import CommandStart, Command
 from sqlalchemy.future import select
 from sqlalchemy import update
 from app.core.config import settings
-from app.db.base import AsyncSessionLocal, engine, Base
-from app.db.models import Post, User, AuthSession
-
-# Ensure static directory exists
-STATIC_DIR = os.path.join(os.path.dirname(__file__), "static", "images")
-os.makedirs(STATIC_DIR, exist_ok=True)
+from app.db.base import AsyncSessionLocal
+from app.db.models import User, AuthSession
+from app.db.versions import bump_feed_versions
+from app.core.ratelimit import limiter, FairScheduler
+from app.core.richtext import render_html, RENDER_VERSION
+from app.db.jobs import enqueue, enqueue_now, PRIORITY_BACKGROUND
+from app.core.linkpreview import find_first_url
+from app.db.ingest import insert_posts, telegram_ingest_key
+from app.core.storage import telegram_media_url
+from app.core.telegram_outbound import outbound_limiter
+from app.core.telegram import create_bot, is_too_large, download_file
+from app.core.phash import image_hash, hash_columns
+from app.db.similar import find_duplicate, link_to
+from app.core.status_replies import StatusReplies
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-bot = Bot(token=settings.BOT_TOKEN)
+bot = create_bot(rate_share=1 - settings.TELEGRAM_API_RATE_SHARE)
 dp = Dispatcher()
 
-# Track media groups to avoid duplicate responses
-media_group_messages = {}
-media_group_locks = {}
+class IngestThrottleMiddleware(BaseMiddleware):
+    """Per-user admission control for incoming messages.
+
+    Instead of dropping messages, a user over budget waits for tokens, and
+    handlers run under a global concurrency cap that is handed out
+    round-robin between users, so one user bulk-forwarding a channel
+    can't starve the DB pool and downloader for everyone else.
+    """
+
+    def __init__(self, concurrency: int):
+        self.scheduler = FairScheduler(concurrency)
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        budget = "upload" if isinstance(event, types.Message) and (event.photo or event.video) else "write"
+        await limiter.acquire(user.id, budget)
+
+        await self.scheduler.acquire(user.id)
+        try:
+            return await handler(event, data)
+        finally:
+            self.scheduler.release()
+
+ingest_throttle = IngestThrottleMiddleware(settings.BOT_INGEST_CONCURRENCY)
+dp.message.middleware(ingest_throttle)
+
+status_replies = StatusReplies(bot, settings.STATUS_BURST_IDLE_SECONDS, settings.STATUS_EDIT_INTERVAL_SECONDS)
 
 @dp.message(CommandStart())
 async def cmd_start(message: types.Message):
@@ -60,6 +100,29 @@ async def cmd_start(message: types.Message):
 
     await message.answer("Welcome to Tabs-TG! Send me images or albums to archive them.")
 
+def media_metadata(media) -> dict:
+    """What the feed needs to know about a Telegram photo / video without downloading it"""
+    meta = {}
+    for field in ('file_size', 'mime_type', 'width', 'height', 'duration'):
+        value = getattr(media, field, None)
+        if value is not None:
+            meta[field] = value
+    return meta
+
+# Smallest photo size worth hashing; Telegram's 90px thumbnails are a bit coarse
+HASH_SOURCE_MIN_SIDE = 320
+
+async def photo_hash(sizes: List[types.PhotoSize]) -> Optional[int]:
+    """Perceptual hash of a photo, from one of its smaller sizes (a few KB to fetch)"""
+    size = next((s for s in sizes if min(s.width, s.height) >= HASH_SOURCE_MIN_SIDE), sizes[-1])
+    buffer = io.BytesIO()
+    try:
+        await download_file(bot, size.file_id, buffer)
+    except Exception as e:
+        logging.warning(f"Couldn't fetch photo {size.file_unique_id} for hashing: {e!r}")
+        return None
+    return await image_hash(buffer.getvalue())
+
 @dp.message()
 async def save_post(message: types.Message):
     content = message.text or message.caption or None
@@ -97,52 +160,31 @@ async def save_post(message: types.Message):
             }
             if entity.url:
                 entity_dict['url'] = entity.url
+            if entity.language:
+                entity_dict['language'] = entity.language
+            if entity.user:
+                entity_dict['user_id'] = entity.user.id
             entities_list.append(entity_dict)
         entities_data = json.dumps(entities_list)
 
-    if message.photo:
-        media_type = 'photo'
-        try:
-            # Get highest resolution photo
-            photo = message.photo[-1]
-            file_id = photo.file_id
-            file = await bot.get_file(file_id)
-            file_path = file.file_path
-            
-            # Generate unique filename
-            filename = f"{uuid.uuid4()}.jpg"
-            local_path = os.path.join(STATIC_DIR, filename)
-            
-            # Download file
-            await bot.download_file(file_path, local_path)
-            
-            # URL path to be stored in DB (accessible via API)
-            media_url = f"/static/images/{filename}"
-        except Exception as e:
-            # If download fails (e.g., file too big), skip media but save text
-            logging.warning(f"Failed to download photo: {e}")
-            media_type = None
-
-    elif message.video:
-        media_type = 'video'
-        try:
-            video = message.video
-            file_id = video.file_id
-            file = await bot.get_file(file_id)
-            file_path = file.file_path
-            
-            # Generate unique filename for video
-            filename = f"{uuid.uuid4()}.mp4"
-            local_path = os.path.join(STATIC_DIR, filename)
-            
-            # Download file
-            await bot.download_file(file_path, local_path)
-            
-            media_url = f"/static/images/{filename}"
-        except Exception as e:
-            # If download fails (e.g., file too big), skip media but save text
-            logging.warning(f"Failed to download video: {e}")
-            media_type = None
+    media_file_id = None
+    media_file_unique_id = None
+    media_meta = None
+    phash = None
+
+    if message.photo or message.video:
+        # Only keep a reference: the file is fetched from Telegram the first
+        # time someone views it (GET /media/{name}, see app/api/media.py)
+        media_type = 'photo' if message.photo else 'video'
+        # Highest resolution photo, or the video itself
+        media = message.photo[-1] if message.photo else message.video
+        media_url = telegram_media_url('.jpg' if message.photo else '.mp4')
+        media_file_id = media.file_id
+        media_file_unique_id = media.file_unique_id
+        media_meta = media_metadata(media)
+        # Hashing costs a Bot API download; only worth it if duplicates are handled
+        if message.photo and settings.DUPLICATE_IMAGE_POLICY != "keep":
+            phash = await photo_hash(message.photo)
 
     async with AsyncSessionLocal() as session:
         # Get current user (or verify existence)
@@ -159,49 +201,85 @@ async def save_post(message: types.Message):
              await session.commit()
              await session.refresh(user)
 
-        new_post = Post(
+        row = dict(
             telegram_message_id=message.message_id,
+            ingest_key=telegram_ingest_key(message.chat.id, message.message_id),
             user_id=user.id,
             content=content,
             entities=entities_data,
+            content_html=render_html(content, entities_data),
+            render_version=RENDER_VERSION,
             source_url=source_url,
             media_url=media_url,
             media_type=media_type,
-            media_group_id=message.media_group_id
+            media_file_id=media_file_id,
+            media_file_unique_id=media_file_unique_id,
+            media_meta=media_meta,
+            media_group_id=message.media_group_id,
+            **hash_columns(phash)
         )
-        session.add(new_post)
-        await session.commit()
-    
-    # Reply to user (only once per media group)
-    should_reply = True
-    if message.media_group_id:
-        # For media groups, only reply once after all messages are processed
-        if message.media_group_id not in media_group_messages:
-            media_group_messages[message.media_group_id] = True
-            # Wait a bit to ensure all messages in the group are processed
-            await asyncio.sleep(0.5)
-        else:
-            should_reply = False
-    
-    if should_reply:
-        if (message.photo or message.video) and not media_url:
-            await message.reply("⚠️ Saved text, but media file is too large to download!")
-        else:
-            await message.reply("Saved!")
-    
-    # Clean up old media group tracking
-    if message.media_group_id and message.media_group_id in media_group_messages:
-        # Remove after 10 seconds to prevent memory leak
-        async def cleanup():
-            await asyncio.sleep(10)
-            if message.media_group_id in media_group_messages:
-                del media_group_messages[message.media_group_id]
-        asyncio.create_task(cleanup())
+
+        # The same picture forwarded again (re-encoded, so only the perceptual hash matches)
+        original = None
+        if settings.DUPLICATE_IMAGE_POLICY != "keep":
+            original = await find_duplicate(session, user.id, phash)
+            # A redelivered update finds its own post; the ingest key takes care of that
+            if original is not None and original.ingest_key == row['ingest_key']:
+                original = None
+        skipped = original is not None and settings.DUPLICATE_IMAGE_POLICY == "skip" and not content
+        if original is not None and not skipped:
+            row = link_to(row, original)
+
+        if not skipped:
+            # Redelivered updates (e.g. after a restart) hit the ingest key and insert nothing
+            inserted = await insert_posts(session, [row])
+            if not inserted:
+                logging.info(f"Skipping already saved message {message.chat.id}:{message.message_id}")
+                return
+            # New posts land in the Inbox
+            await bump_feed_versions(session, user.id, [None])
+            url = find_first_url(content, entities_data)
+            if url:
+                await enqueue(session, "link_preview", {"post_id": inserted[0].id, "user_id": user.id, "url": url})
+            await session.commit()
+
+    if skipped:
+        logging.info(f"Skipped message {message.chat.id}:{message.message_id}, a duplicate of post {original.id}")
+
+    # One status message per burst (albums, bulk forwards), edited as items arrive
+    await status_replies.saved(
+        message,
+        too_large=bool(row['media_meta'] and is_too_large(row['media_meta'].get('file_size'))),
+        duplicate=skipped,
+        source_url=source_url,
+    )
+
+# The API's /metrics endpoints only see the API process, so the bot logs its own
+METRICS_LOG_INTERVAL = 60
+
+async def log_metrics():
+    """Log ingest throttling and outbound pacing counters whenever they change"""
+    last = None
+    while True:
+        await asyncio.sleep(METRICS_LOG_INTERVAL)
+        metrics = {
+            "ingest": limiter.stats(),
+            "ingest_waiting": ingest_throttle.scheduler.pending(),
+            "outbound": dict(outbound_limiter.metrics),
+        }
+        if metrics != last:
+            logging.info(f"Bot metrics: {json.dumps(metrics)}")
+            last = metrics
 
 async def main():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    await dp.start_polling(bot)
+    # Schema is managed by `python -m app.db.migrate`, run before deploys
+    # Bring posts rendered by an older renderer (or never) up to date
+    await enqueue_now("rerender_stale_posts", priority=PRIORITY_BACKGROUND, dedupe_key="rerender_stale_posts")
+    metrics_task = asyncio.create_task(log_metrics())
+    try:
+        await dp.start_polling(bot)
+    finally:
+        metrics_task.cancel()
 
 if __name__ == "__main__":
     asyncio.run(main())
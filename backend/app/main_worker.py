@@ -0,0 +1,126 @@
+"""Background job worker.
+
+    python -m app.main_worker                  # run jobs until SIGTERM / Ctrl+C
+    python -m app.main_worker --concurrency 8
+    python -m app.main_worker --retry-dead     # re-queue dead-lettered jobs and exit
+
+Any number of workers can run at once; see app/db/jobs.py.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import traceback
+from app.core.config import settings
+from app.db.jobs import (
+    JOB_HANDLERS, claim_job, complete_job, fail_job,
+    requeue_stale_jobs, prune_finished_jobs, retry_dead_jobs,
+)
+import app.db.job_handlers  # noqa: F401  (registers the handlers)
+
+logging.basicConfig(level=logging.INFO)
+
+MAINTENANCE_INTERVAL = 60
+
+
+class Worker:
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = asyncio.Event()
+
+    async def run(self):
+        """Run jobs until `stopping` is set"""
+        logging.info(f"Worker {self.worker_id} started with {self.concurrency} slots")
+        maintenance = asyncio.create_task(self.maintenance())
+        # Slots finish the job they're running before they stop
+        await asyncio.gather(*(self.slot() for _ in range(self.concurrency)))
+        maintenance.cancel()
+        logging.info(f"Worker {self.worker_id} stopped")
+
+    async def sleep(self, seconds: float):
+        """Sleep, waking up early on shutdown"""
+        try:
+            await asyncio.wait_for(self.stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def slot(self):
+        while not self.stopping.is_set():
+            try:
+                job = await claim_job(self.worker_id)
+            except Exception as e:
+                logging.warning(f"Failed to claim a job: {e}")
+                await self.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                await self.sleep(self.poll_interval)
+                continue
+
+            try:
+                await self.execute(job)
+            except Exception as e:
+                # Couldn't record the outcome; the job is re-queued once its lock goes stale
+                logging.warning(f"Failed to finish job {job.id}: {e}")
+                await self.sleep(self.poll_interval)
+
+    async def execute(self, job):
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            await fail_job(job, f"No handler for job kind '{job.kind}'", retry=False)
+            logging.error(f"Dead-lettered job {job.id}: unknown kind '{job.kind}'")
+            return
+
+        try:
+            follow_up = await asyncio.wait_for(handler(job.payload or {}), timeout=settings.JOB_TIMEOUT_SECONDS)
+        except Exception as e:
+            error = "".join(traceback.format_exception_only(type(e), e)).strip() or type(e).__name__
+            status = await fail_job(job, error)
+            logging.warning(
+                f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}/{job.max_attempts}, "
+                f"{'retrying later' if status == 'pending' else 'dead-lettered'}: {error}"
+            )
+        else:
+            await complete_job(job, follow_up)
+            logging.info(f"Job {job.id} ({job.kind}) done" + (", continuing in a follow-up job" if follow_up is not None else ""))
+
+    async def maintenance(self):
+        while True:
+            try:
+                requeued = await requeue_stale_jobs()
+                if requeued:
+                    logging.warning(f"Re-queued {requeued} jobs abandoned by a dead worker")
+                await prune_finished_jobs()
+            except Exception as e:
+                logging.warning(f"Job maintenance failed: {e}")
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--poll-interval", type=float, default=settings.JOB_POLL_INTERVAL_SECONDS)
+    parser.add_argument("--retry-dead", action="store_true", help="re-queue dead-lettered jobs and exit")
+    parser.add_argument("--kind", help="with --retry-dead: only jobs of this kind")
+    args = parser.parse_args()
+
+    if args.retry_dead:
+        print(f"Re-queued {asyncio.run(retry_dead_jobs(args.kind))} dead jobs")
+        return
+
+    async def run():
+        worker = Worker(args.concurrency, args.poll_interval)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, worker.stopping.set)
+        await worker.run()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
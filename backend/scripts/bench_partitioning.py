@@ -0,0 +1,161 @@
+"""Feed / reorder / delete latency on a plain vs hash-partitioned posts table.
+
+Builds two copies of the posts table in scratch schemas of DATABASE_URL
+(`bench_plain` and `bench_hash`), fills both with the same synthetic rows,
+then times the statements the API actually issues:
+
+  - feed:    GET /posts query for one user's Inbox
+  - reorder: PUT /posts/reorder single CASE update of 100 posts
+  - delete:  DELETE /posts/{id} for a single post
+
+Writes are rolled back so every sample sees the same data.
+
+    cd backend
+    python -m app.db.migrate            # bench tables copy the live posts columns
+    python scripts/bench_partitioning.py --rows 10000000 --users 100000
+
+Filling 10M rows takes a few minutes; use --keep to reuse the data on the next run.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, update, delete, case  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+from app.db.base import engine  # noqa: E402
+from app.db.models import Post  # noqa: E402
+
+INDEXES = (
+    ("feed", "user_id, tab_id, position, created_at"),
+    ("id", "id"),
+    ("media_group_id", "user_id, media_group_id"),
+)
+
+
+async def build(schema: str, rows: int, users: int, partitions: int):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+        if partitions:
+            await conn.execute(text(
+                f"CREATE TABLE {schema}.posts (LIKE public.posts INCLUDING DEFAULTS) PARTITION BY HASH (user_id)"
+            ))
+            await conn.execute(text(f"ALTER TABLE {schema}.posts ADD PRIMARY KEY (id, user_id)"))
+            for remainder in range(partitions):
+                await conn.execute(text(
+                    f"CREATE TABLE {schema}.posts_p{remainder} PARTITION OF {schema}.posts "
+                    f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+                ))
+        else:
+            await conn.execute(text(f"CREATE TABLE {schema}.posts (LIKE public.posts INCLUDING DEFAULTS)"))
+            await conn.execute(text(f"ALTER TABLE {schema}.posts ADD PRIMARY KEY (id)"))
+
+    # Fill in chunks so a single huge transaction doesn't blow up WAL / memory
+    chunk = 1_000_000
+    for start in range(1, rows + 1, chunk):
+        end = min(rows, start + chunk - 1)
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                f"INSERT INTO {schema}.posts (id, user_id, telegram_message_id, content, tab_id, position, created_at) "
+                f"SELECT i, (i % CAST(:users AS integer)) + 1, i, 'post ' || i, NULL, i / CAST(:users AS integer), now() - make_interval(secs => i) "
+                f"FROM generate_series(CAST(:start AS integer), CAST(:end AS integer)) AS i"
+            ), {"users": users, "start": start, "end": end})
+        print(f"  {schema}: {end} / {rows} rows")
+
+    async with engine.begin() as conn:
+        for name, columns in INDEXES:
+            await conn.execute(text(f"CREATE INDEX ix_{schema}_{name} ON {schema}.posts ({columns})"))
+        await conn.execute(text(f"ANALYZE {schema}.posts"))
+
+
+async def sample(schema: str, users: int, samples: int) -> dict:
+    timings = {"feed": [], "reorder": [], "delete": []}
+    rng = random.Random(42)
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(schema_translate_map={None: schema})
+        for _ in range(samples):
+            user_id = rng.randint(1, users)
+
+            started = time.perf_counter()
+            result = await conn.execute(
+                select(Post)
+                .where(Post.user_id == user_id)
+                .where(Post.tab_id.is_(None))
+                .order_by(Post.position.asc(), Post.created_at.desc())
+            )
+            posts = result.all()
+            timings["feed"].append(time.perf_counter() - started)
+            await conn.rollback()
+
+            post_ids = [p.id for p in posts[:100]]
+            if not post_ids:
+                continue
+            positions = {post_id: index for index, post_id in enumerate(reversed(post_ids))}
+
+            started = time.perf_counter()
+            await conn.execute(
+                update(Post)
+                .where(Post.user_id == user_id)
+                .where(Post.id.in_(positions.keys()))
+                .values(position=case(positions, value=Post.id))
+            )
+            timings["reorder"].append(time.perf_counter() - started)
+            await conn.rollback()
+
+            started = time.perf_counter()
+            await conn.execute(delete(Post).where(Post.id == post_ids[0], Post.user_id == user_id))
+            timings["delete"].append(time.perf_counter() - started)
+            await conn.rollback()
+
+    return timings
+
+
+def report(schema: str, timings: dict):
+    for name, values in timings.items():
+        if not values:
+            continue
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{schema:12} {name:8} p50 {statistics.median(values) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+async def run(args):
+    layouts = (("bench_plain", 0), ("bench_hash", args.partitions))
+    if not args.keep:
+        for schema, partitions in layouts:
+            print(f"Building {schema} ({args.rows} rows, {args.users} users)")
+            await build(schema, args.rows, args.users, partitions)
+
+    for schema, _ in layouts:
+        report(schema, await sample(schema, args.users, args.samples))
+
+    if args.drop:
+        async with engine.begin() as conn:
+            for schema, _ in layouts:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="reuse tables from a previous run")
+    parser.add_argument("--drop", action="store_true", help="drop the scratch schemas afterwards")
+    args = parser.parse_args()
+
+    engine.echo = False
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Minimal stand-in for the Bot API, for testing media fetching and pacing.
+
+Serves getFile and file downloads for the files in a directory, using each
+file's name as its file_id. Files bigger than --limit are refused the way
+the real Bot API does ("file is too big"). sendMessage / editMessageText
+are accepted and counted; more than --chat-rate of them per second in one
+chat get a 429 with retry_after, like Telegram's flood control.
+
+    cd backend
+    python scripts/fake_telegram.py ./fixtures --port 8081
+    TELEGRAM_API_URL=http://localhost:8081 BOT_TOKEN=123:fake uvicorn app.main_api:app
+
+Then give posts media_file_id=<file name> and open /media/<name>. Every
+download and message is logged, and GET /stats returns the counters.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+from aiohttp import web
+
+
+def create_app(directory: str, limit: int, delay: float = 0, chat_rate: int = 1) -> web.Application:
+    downloads = {}
+    calls = {"sendMessage": 0, "editMessageText": 0, "429": 0}
+    recent_sends = {}  # chat_id -> timestamps of the last second
+    message_ids = itertools.count(1)
+
+    def error(description: str, status: int = 400):
+        return web.json_response({"ok": False, "error_code": status, "description": description}, status=status)
+
+    async def get_file(request: web.Request):
+        params = dict(request.query)
+        if request.method == "POST":
+            params.update(await request.post())
+        file_id = params.get("file_id", "")
+
+        path = os.path.join(directory, os.path.basename(file_id))
+        if not file_id or not os.path.isfile(path):
+            return error("Bad Request: invalid file_id")
+        size = os.path.getsize(path)
+        if size > limit:
+            return error("Bad Request: file is too big")
+
+        return web.json_response({"ok": True, "result": {
+            "file_id": file_id,
+            "file_unique_id": f"u-{file_id}",
+            "file_size": size,
+            "file_path": f"files/{os.path.basename(file_id)}",
+        }})
+
+    async def download(request: web.Request):
+        name = os.path.basename(request.match_info["path"])
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            raise web.HTTPNotFound()
+        downloads[name] = downloads.get(name, 0) + 1
+        print(f"download #{downloads[name]} of {name}")
+        if delay:
+            await asyncio.sleep(delay)
+        return web.FileResponse(path)
+
+    async def send(request: web.Request):
+        params = dict(request.query)
+        if request.method == "POST":
+            params.update(await request.post())
+        method = request.match_info["method"]
+        chat_id = int(params.get("chat_id", 0))
+
+        now = time.monotonic()
+        sends = [t for t in recent_sends.get(chat_id, []) if now - t < 1]
+        if len(sends) >= chat_rate:
+            calls["429"] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+        recent_sends[chat_id] = sends + [now]
+        calls[method] += 1
+        print(f"{method} in chat {chat_id}: {params.get('text', '')!r}")
+
+        return web.json_response({"ok": True, "result": {
+            "message_id": int(params.get("message_id") or next(message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }})
+
+    async def stats(request: web.Request):
+        return web.json_response({"downloads": downloads, "calls": calls})
+
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/getFile", get_file)
+    app.router.add_route("*", "/bot{token}/{method:sendMessage|editMessageText}", send)
+    app.router.add_get("/file/bot{token}/{path:.+}", download)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--limit", type=int, default=20 * 1024 * 1024, help="max downloadable size in bytes")
+    parser.add_argument("--delay", type=float, default=0, help="seconds to stall each download")
+    parser.add_argument("--chat-rate", type=int, default=1, help="messages per second per chat before a 429")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.directory, args.limit, args.delay, args.chat_rate), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
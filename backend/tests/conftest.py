@@ -0,0 +1,34 @@
+import asyncio
+import os
+import sys
+import pytest
+
+# Tests that need Postgres run against TEST_DATABASE_URL, a database they may
+# wipe, and are skipped without it. Everything else never connects, but
+# Settings still need a DATABASE_URL.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/tabs_test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def postgres():
+    """Migrated, emptied test database with users 1 and 2"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    from sqlalchemy import text
+    from app.db.base import engine
+    from app.db.migrate import migrate
+
+    async def reset():
+        await migrate()
+        async with engine.begin() as conn:
+            await conn.execute(text("TRUNCATE users, auth_sessions, posts, tabs, jobs RESTART IDENTITY CASCADE"))
+            await conn.execute(text("INSERT INTO users (id, telegram_id) VALUES (1, 1), (2, 2)"))
+        # Pooled connections belong to this test's event loop
+        await engine.dispose()
+
+    asyncio.run(reset())
+    yield engine
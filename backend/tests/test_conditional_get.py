@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+from app.api.deps import etag_matches, not_modified
+from app.db.base import engine
+from app.main_api import app
+
+
+def test_etag_matches():
+    assert etag_matches('"v1"', '"v1"')
+    assert not etag_matches('"v2"', '"v1"')
+    # Weak comparison: W/ on either side is ignored
+    assert etag_matches('W/"v1"', '"v1"')
+    assert etag_matches('"v1"', 'W/"v1"')
+    # Lists, with or without spaces
+    assert etag_matches('"v0", W/"v1"', '"v1"')
+    assert etag_matches('"v0","v1"', '"v1"')
+    assert not etag_matches('"v0", "v2"', '"v1"')
+    assert etag_matches("*", '"v1"')
+    assert not etag_matches(None, '"v1"')
+    assert not etag_matches('"v1"', None)
+
+
+def test_not_modified():
+    response = not_modified('"v1"')
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == '"v1"'
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert response.headers["Vary"] == "Authorization"
+
+
+def test_feed_revalidation(postgres):
+    headers = {"Authorization": "Bearer 1"}
+    with TestClient(app) as client:
+        try:
+            first = client.get("/posts", headers=headers)
+            assert first.status_code == 200
+            etag = first.headers["ETag"]
+
+            again = client.get("/posts", headers={**headers, "If-None-Match": etag})
+            assert again.status_code == 304
+            assert again.content == b""
+            assert again.headers["ETag"] == etag
+
+            # A new post changes the inbox version
+            assert client.post("/posts", headers=headers, data={"content": "hi"}).status_code == 200
+            changed = client.get("/posts", headers={**headers, "If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.headers["ETag"] != etag
+            assert [p["content"] for p in changed.json()] == ["hi"]
+        finally:
+            client.portal.call(engine.dispose)
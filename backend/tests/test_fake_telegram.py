@@ -0,0 +1,82 @@
+import asyncio
+import importlib.util
+import io
+import os
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+from app.core.config import settings
+from app.core.telegram import FileTooLarge, create_bot, download_file
+
+# scripts/ isn't a package
+_spec = importlib.util.spec_from_file_location(
+    "fake_telegram", os.path.join(os.path.dirname(__file__), "..", "scripts", "fake_telegram.py")
+)
+fake_telegram = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fake_telegram)
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "small.jpg").write_bytes(b"jpeg" * 100)
+    (tmp_path / "big.mp4").write_bytes(b"\0" * 5000)
+    return tmp_path
+
+
+def run_against_fake(files, monkeypatch, scenario, **options):
+    """Run scenario(bot, server) with a bot pointed at a fake Bot API server"""
+    async def main():
+        server = TestServer(fake_telegram.create_app(str(files), limit=1000, **options))
+        await server.start_server()
+        monkeypatch.setattr(settings, "TELEGRAM_API_URL", str(server.make_url("")).rstrip("/"))
+        monkeypatch.setattr(settings, "BOT_TOKEN", "123:fake")
+        bot = create_bot()
+        try:
+            return await scenario(bot, server)
+        finally:
+            await bot.session.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+async def fake_stats(server) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(server.make_url("/stats")) as response:
+            return await response.json()
+
+
+def test_download_into_path_and_buffer(files, monkeypatch, tmp_path_factory):
+    destination = tmp_path_factory.mktemp("out") / "small.jpg"
+
+    async def scenario(bot, server):
+        await download_file(bot, "small.jpg", str(destination))
+        buffer = io.BytesIO()
+        await download_file(bot, "small.jpg", buffer)
+        return buffer.getvalue(), await fake_stats(server)
+
+    data, stats = run_against_fake(files, monkeypatch, scenario)
+    assert destination.read_bytes() == data == b"jpeg" * 100
+    assert stats["downloads"] == {"small.jpg": 2}
+
+
+def test_file_over_the_limit_is_too_large(files, monkeypatch):
+    async def scenario(bot, server):
+        with pytest.raises(FileTooLarge):
+            await download_file(bot, "big.mp4", io.BytesIO())
+        return await fake_stats(server)
+
+    stats = run_against_fake(files, monkeypatch, scenario)
+    assert stats["downloads"] == {}
+
+
+def test_flood_limited_messages_are_retried(files, monkeypatch):
+    async def scenario(bot, server):
+        # The fake allows one message per second per chat; the bot's own per
+        # chat bucket lets a burst of 3 through, so two of them get a 429
+        messages = await asyncio.gather(*(bot.send_message(7, f"m{i}") for i in range(3)))
+        return messages, await fake_stats(server)
+
+    messages, stats = run_against_fake(files, monkeypatch, scenario, chat_rate=1)
+    assert [m.text for m in messages] == ["m0", "m1", "m2"]
+    assert stats["calls"]["sendMessage"] == 3
+    assert stats["calls"]["429"] >= 2
@@ -0,0 +1,23 @@
+import asyncio
+from app.db.base import AsyncSessionLocal, engine
+from app.db.ingest import insert_posts
+
+
+def test_insert_posts_returns_rows_in_order(postgres):
+    # Different column sets go out as separate statements
+    rows = [
+        dict(user_id=1, telegram_message_id=-1, ingest_key="k3", content="first"),
+        dict(user_id=1, telegram_message_id=-2, ingest_key="k1", media_size=10, media_url="/static/images/a.jpg"),
+        dict(user_id=1, telegram_message_id=-3, ingest_key="k0", content="skipped"),
+        dict(user_id=1, telegram_message_id=-4, ingest_key="k2", content="last"),
+    ]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await insert_posts(db, [dict(user_id=1, telegram_message_id=0, ingest_key="k0")])
+            inserted = await insert_posts(db, rows)
+            await db.commit()
+        await engine.dispose()
+        return [p.ingest_key for p in inserted]
+
+    assert asyncio.run(scenario()) == ["k3", "k1", "k2"]
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import pytest
+from app.core.media_cache import MediaCache
+from app.core.storage import PARTIAL_SUFFIX
+
+
+def writer(data: bytes, calls: list, delay: float = 0):
+    """fetch() callback writing `data`, recording each call"""
+    async def fetch(destination: str):
+        calls.append(destination)
+        await asyncio.sleep(delay)
+        with open(destination, "wb") as f:
+            f.write(data)
+    return fetch
+
+
+def test_concurrent_misses_share_one_fetch(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1000)
+    calls = []
+
+    async def scenario():
+        fetch = writer(b"x" * 10, calls, delay=0.05)
+        return await asyncio.gather(*(cache.acquire("a.jpg", fetch) for _ in range(5)))
+
+    paths = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert calls[0].endswith(PARTIAL_SUFFIX)
+    assert set(paths) == {os.path.join(str(tmp_path), "a.jpg")}
+    assert cache._pins["a.jpg"] == 5
+    assert cache.stats()["misses"] == 1 and cache.stats()["downloading"] == 0
+
+    for _ in range(5):
+        cache.release("a.jpg")
+    assert "a.jpg" not in cache._pins
+
+
+def test_hit_after_miss(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1000)
+    calls = []
+
+    async def scenario():
+        for _ in range(3):
+            await cache.acquire("a.jpg", writer(b"data", calls))
+            cache.release("a.jpg")
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_pinned_file_is_not_evicted(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=15)
+    calls = []
+
+    async def scenario():
+        a = await cache.acquire("a.jpg", writer(b"a" * 10, calls))
+        # Over budget now, but a.jpg is still being sent
+        b = await cache.acquire("b.jpg", writer(b"b" * 10, calls))
+        assert os.path.exists(a) and os.path.exists(b)
+        assert cache.stats()["evictions"] == 0
+
+        cache.release("a.jpg")
+        # Unpinned: a.jpg is the least recently used and goes
+        assert not os.path.exists(a)
+        assert os.path.exists(b)
+        cache.release("b.jpg")
+
+    asyncio.run(scenario())
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 10
+
+
+def test_least_recently_used_goes_first(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=25)
+    calls = []
+
+    async def get(name):
+        await cache.acquire(name, writer(b"x" * 10, calls))
+        cache.release(name)
+
+    async def scenario():
+        await get("a.jpg")
+        await get("b.jpg")
+        await get("a.jpg")  # Hit: a.jpg is now more recent than b.jpg
+        await get("c.jpg")
+
+    asyncio.run(scenario())
+    assert sorted(os.listdir(tmp_path)) == ["a.jpg", "c.jpg"]
+
+
+def test_failed_fetch_leaves_nothing_and_is_retried(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1000)
+
+    async def broken(destination: str):
+        with open(destination, "wb") as f:
+            f.write(b"half")
+        raise ConnectionError("reset")
+
+    async def scenario():
+        results = await asyncio.gather(
+            cache.acquire("a.jpg", broken), cache.acquire("a.jpg", broken), return_exceptions=True
+        )
+        assert all(isinstance(r, ConnectionError) for r in results)
+        assert os.listdir(tmp_path) == []
+        assert not cache._pins
+
+        calls = []
+        await cache.acquire("a.jpg", writer(b"ok", calls))
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_viewer_does_not_cancel_the_download(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1000)
+    calls = []
+
+    async def scenario():
+        fetch = writer(b"x" * 10, calls, delay=0.05)
+        first = asyncio.create_task(cache.acquire("a.jpg", fetch))
+        second = asyncio.create_task(cache.acquire("a.jpg", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        path = await second
+        assert os.path.exists(path)
+        # Only the remaining viewer holds a pin
+        assert cache._pins["a.jpg"] == 1
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    (tmp_path / "old.jpg").write_bytes(b"x" * 10)
+    (tmp_path / "new.jpg").write_bytes(b"x" * 10)
+    os.utime(tmp_path / "old.jpg", (1, 1))
+    (tmp_path / ("partial.jpg" + PARTIAL_SUFFIX)).write_bytes(b"x")
+
+    cache = MediaCache(str(tmp_path), max_bytes=15)
+    stats = cache.stats()
+    assert stats["files"] == 0  # Loaded lazily
+    calls = []
+
+    async def scenario():
+        await cache.acquire("new.jpg", writer(b"", calls))
+        cache.release("new.jpg")
+
+    asyncio.run(scenario())
+    assert calls == []
+    # Oldest by mtime was evicted, the leftover partial download removed
+    assert os.listdir(tmp_path) == ["new.jpg"]
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import random
+import time
+from sqlalchemy import select
+from app.core.storage import media_url_for
+from app.db import media_gc
+from app.db.base import AsyncSessionLocal, engine
+from app.db.ingest import insert_posts
+from app.db.media_gc import collect_garbage, recompute_storage_usage, sorted_media_files
+from app.db.models import Post
+from app.db.storage import add_storage_used, get_storage_used
+
+
+def make_file(directory, name: str, size: int, age: float = 0):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    if age:
+        old = time.time() - age
+        os.utime(path, (old, old))
+
+
+def test_sorted_media_files_merges_spilled_chunks(tmp_path):
+    media, workdir = tmp_path / "media", tmp_path / "work"
+    media.mkdir()
+    workdir.mkdir()
+    names = [f"{i:02d}.jpg" for i in range(10)]
+    for name in random.sample(names, len(names)):
+        make_file(media, name, size=int(name[:2]))
+    (media / "subdir").mkdir()
+
+    files = list(sorted_media_files(str(media), str(workdir), chunk_size=3))
+    assert [(name, size) for name, size, _ in files] == [(name, int(name[:2])) for name in names]
+    # 10 files in chunks of 3
+    assert len(os.listdir(workdir)) == 4
+
+
+def test_recompute_keeps_concurrent_charge(postgres):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            # Drifted counter for the recompute to fix
+            await add_storage_used(db, 1, 100)
+            await db.commit()
+
+        async with AsyncSessionLocal() as upload:
+            # An upload in flight: post inserted and charged, not committed yet
+            await insert_posts(upload, [dict(user_id=1, telegram_message_id=1, ingest_key="k1", media_size=500)])
+            await add_storage_used(upload, 1, 500)
+
+            recompute = asyncio.create_task(recompute_storage_usage())
+            await asyncio.sleep(0.2)
+            assert not recompute.done()  # Waiting for the user's row
+            await upload.commit()
+            await recompute
+
+        async with AsyncSessionLocal() as db:
+            used = await get_storage_used(db, 1)
+        await engine.dispose()
+        return used
+
+    assert asyncio.run(scenario()) == 500
+
+
+def test_collect_garbage(postgres, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_gc, "MEDIA_DIR", str(tmp_path))
+    day = 24 * 3600
+    make_file(tmp_path, "a-shared.jpg", 100, age=2 * day)
+    make_file(tmp_path, "b-own.jpg", 10, age=2 * day)
+    make_file(tmp_path, "c-orphan.jpg", 7, age=2 * day)
+    make_file(tmp_path, "d-orphan.part", 3, age=2 * day)
+    make_file(tmp_path, "e-fresh-orphan.jpg", 5)  # An ingest that hasn't committed its post yet
+    make_file(tmp_path, "f-own.jpg", 20, age=2 * day)
+
+    def post(key, name, size, user_id=1):
+        return dict(user_id=user_id, telegram_message_id=0, ingest_key=key, media_url=media_url_for(name), media_size=size)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await insert_posts(db, [
+                # One stored copy, the others linked to it (media_size 0)
+                post("k1", "a-shared.jpg", 100),
+                post("k2", "a-shared.jpg", 0),
+                post("k3", "a-shared.jpg", 0),
+                post("k4", "b-own.jpg", None),
+                post("k5", "f-own.jpg", 20, user_id=2),
+                post("k6", "gone.jpg", 30),
+            ])
+            await db.commit()
+
+        stats = await collect_garbage(grace_seconds=day, chunk_size=2)
+
+        async with AsyncSessionLocal() as db:
+            sizes = dict((await db.execute(select(Post.ingest_key, Post.media_size))).all())
+            used = await get_storage_used(db, 1), await get_storage_used(db, 2)
+        await engine.dispose()
+        return stats, sizes, used
+
+    stats, sizes, used = asyncio.run(scenario())
+    assert stats == {"files": 6, "orphans": 2, "orphan_bytes": 10, "deleted": 2, "missing": 1, "sizes_filled": 1}
+    assert sorted(os.listdir(tmp_path)) == ["a-shared.jpg", "b-own.jpg", "e-fresh-orphan.jpg", "f-own.jpg"]
+    assert sizes["k4"] == 10
+    assert used == (100 + 10 + 30, 20)
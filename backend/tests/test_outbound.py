@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+from aiogram.methods import GetFile, SendMessage
+from app.core.status_replies import StatusReplies
+from app.core.telegram_outbound import OutboundLimiter
+
+
+class FakeBot:
+    def __init__(self):
+        self.replies = []
+        self.edits = []
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.edits.append((chat_id, message_id, text))
+
+
+def fake_message(bot: FakeBot, chat_id: int = 1):
+    async def reply(text):
+        bot.replies.append(text)
+        # The reply takes a while; items keep arriving meanwhile
+        await asyncio.sleep(0.02)
+        return SimpleNamespace(message_id=len(bot.replies))
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id), reply=reply)
+
+
+def test_burst_of_saves_gets_one_reply_and_one_edit():
+    bot = FakeBot()
+    replies = StatusReplies(bot, idle_seconds=5, edit_interval=0.05)
+
+    async def scenario():
+        await asyncio.gather(*(replies.saved(fake_message(bot)) for _ in range(10)))
+        await replies._bursts[1].edit_task
+
+    asyncio.run(scenario())
+    assert bot.replies == ["Saved!"]
+    assert bot.edits == [(1, 1, "Saved 10 items")]
+
+
+def test_downloads_overtake_queued_chat_sends():
+    limiter = OutboundLimiter(rate=50, burst=1, chat_rate=1000, chat_burst=1000, max_retries=0)
+    served = []
+
+    async def make_request(bot, method):
+        served.append(type(method).__name__)
+
+    async def scenario():
+        # Use up the global burst, so everything below queues
+        await limiter.acquire()
+        sends = [
+            asyncio.create_task(limiter(make_request, None, SendMessage(chat_id=1, text=str(i))))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        download = asyncio.create_task(limiter(make_request, None, GetFile(file_id="file")))
+        await asyncio.gather(*sends, download)
+
+    asyncio.run(scenario())
+    assert served == ["GetFile", "SendMessage", "SendMessage", "SendMessage"]
+    assert limiter.metrics["queued"] == 4
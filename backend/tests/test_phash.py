@@ -0,0 +1,95 @@
+import io
+import random
+from math import comb
+import pytest
+from app.core.phash import (
+    BANDS, BAND_BITS, HASH_BITS, MAX_SEARCH_DISTANCE,
+    band_neighbours, dhash, hamming, hash_bands, hash_columns, to_signed, to_unsigned,
+)
+
+
+def flip_bits(value: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(HASH_BITS), count):
+        value ^= 1 << bit
+    return value
+
+
+def test_signed_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed(value)
+        assert -(1 << 63) <= signed < (1 << 63)
+        assert to_unsigned(signed) == value
+    assert hamming(to_signed((1 << 64) - 1), 0) == 64
+
+
+def test_hash_columns():
+    value = 0x1234_5678_9ABC_DEF0
+    columns = hash_columns(value)
+    assert columns["phash"] == value
+    assert [columns[f"phash_band{i}"] for i in range(BANDS)] == [0xDEF0, 0x9ABC, 0x5678, 0x1234]
+    assert hash_columns(None) == {"phash": None, **{f"phash_band{i}": None for i in range(BANDS)}}
+    assert hash_bands(to_signed(1 << 63)) == [0, 0, 0, 0x8000]
+
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 3])
+def test_band_neighbours(radius):
+    band = 0b1010_0000_1111_0001
+    neighbours = band_neighbours(band, radius)
+    assert len(neighbours) == len(set(neighbours)) == sum(comb(BAND_BITS, k) for k in range(radius + 1))
+    assert neighbours[0] == band
+    assert all(bin(n ^ band).count("1") <= radius for n in neighbours)
+    assert all(0 <= n < 1 << BAND_BITS for n in neighbours)
+
+
+@pytest.mark.parametrize("distance", range(MAX_SEARCH_DISTANCE + 1))
+def test_pigeonhole_radius_finds_every_match(distance):
+    # find_similar probes each band's neighbourhood of radius distance // BANDS;
+    # any hash within `distance` bits must hit at least one of those probes
+    rng = random.Random(distance)
+    radius = distance // BANDS
+    for _ in range(200):
+        query = rng.getrandbits(HASH_BITS)
+        candidate = flip_bits(query, distance, rng)
+        assert hamming(query, candidate) == distance
+        probes = [set(band_neighbours(band, radius)) for band in hash_bands(query)]
+        assert any(band in probe for band, probe in zip(hash_bands(candidate), probes))
+
+
+def picture(seed: int, size=(800, 600)):
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (30, 60, 90))
+    draw = ImageDraw.Draw(image)
+    for _ in range(30):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        fill = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        draw.ellipse((x, y, x + size[0] // 5, y + size[1] // 5), fill=fill)
+    return image
+
+
+def encode(image, fmt="JPEG", **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def test_dhash_survives_reencoding():
+    pytest.importorskip("PIL")
+    image = picture(1)
+    original = dhash(encode(image, quality=90))
+    reencoded = dhash(encode(image.resize((400, 300)), quality=30))
+    as_png = dhash(encode(image.resize((640, 480)), "PNG"))
+    different = dhash(encode(picture(2), quality=90))
+
+    assert hamming(original, reencoded) <= 4
+    assert hamming(original, as_png) <= 4
+    assert hamming(original, different) > 10
+
+
+def test_dhash_from_path(tmp_path):
+    pytest.importorskip("PIL")
+    data = encode(picture(3), quality=80)
+    path = tmp_path / "image.jpg"
+    path.write_bytes(data)
+    assert dhash(str(path)) == dhash(data)
@@ -0,0 +1,86 @@
+import json
+from app.core.richtext import render_html, safe_href
+
+
+def entity(kind, offset, length, **extra):
+    return {"type": kind, "offset": offset, "length": length, **extra}
+
+
+def test_plain_text_is_escaped():
+    assert render_html("<b>x</b> & y", None) == "&lt;b&gt;x&lt;/b&gt; &amp; y"
+    assert render_html("", None) is None
+    assert render_html(None, [entity("bold", 0, 1)]) is None
+
+
+def test_offsets_are_utf16_code_units():
+    # The emoji is outside the BMP: one Python character, two UTF-16 units
+    assert render_html("😀 bold", [entity("bold", 3, 4)]) == "😀 <b>bold</b>"
+    # Mathematical bold letters are astral too; the entity covers only the first
+    assert render_html("x 𝐀𝐁", [entity("italic", 2, 2)]) == "x <i>𝐀</i>𝐁"
+
+
+def test_entities_as_json_string():
+    assert render_html("hi there", json.dumps([entity("bold", 0, 2)])) == "<b>hi</b> there"
+    assert render_html("hi", "not json") == "hi"
+
+
+def test_nested_entities():
+    assert render_html("abcdef", [entity("bold", 0, 6), entity("italic", 2, 2)]) == "<b>ab<i>cd</i>ef</b>"
+    # Same start: the longer entity opens first and closes last
+    assert render_html("abcd", [entity("italic", 0, 2), entity("bold", 0, 4)]) == "<b><i>ab</i>cd</b>"
+
+
+def test_overlapping_entities_are_closed_and_reopened():
+    html = render_html("abcdef", [entity("bold", 0, 4), entity("italic", 2, 4)])
+    assert html == "<b>ab<i>cd</i></b><i>ef</i>"
+
+    html = render_html("abcdefgh", [
+        entity("bold", 0, 4), entity("italic", 2, 4), entity("underline", 3, 5),
+    ])
+    assert html == "<b>ab<i>c<u>d</u></i></b><i><u>ef</u></i><u>gh</u>"
+
+
+def test_entities_are_clipped_and_bad_ones_ignored():
+    html = render_html("hi", [
+        entity("bold", 1, 50),
+        entity("bold", "x", 1),
+        {"type": "italic"},
+        entity("italic", 5, 2),
+        entity("unknown_kind", 0, 2),
+    ])
+    assert html == "h<b>i</b>"
+
+
+def test_javascript_links_are_dropped():
+    for url in ("javascript:alert(1)", " JavaScript:alert(1)", "data:text/html,<script>", "vbscript:x"):
+        assert render_html("click", [entity("text_link", 0, 5, url=url)]) == "click"
+    # A url entity is rendered from the text itself
+    assert render_html("javascript:alert(1)", [entity("url", 0, 19)]) == "javascript:alert(1)"
+
+
+def test_links_are_attribute_escaped():
+    html = render_html("click", [entity("text_link", 0, 5, url='https://a.b/?x="1"&y')])
+    assert html == '<a href="https://a.b/?x=&quot;1&quot;&amp;y" target="_blank" rel="noopener noreferrer">click</a>'
+
+
+def test_bare_urls_outside_entities_are_linked():
+    link = '<a href="https://a.b/?x=1&amp;y" target="_blank" rel="noopener noreferrer">https://a.b/?x=1&amp;y</a>'
+    assert render_html("see https://a.b/?x=1&y now", None) == f"see {link} now"
+    # Not inside entities: no nested links, code stays code
+    assert render_html("https://a.b", [entity("code", 0, 11)]) == "<code>https://a.b</code>"
+    assert render_html("(https://a.b)", None) == '(<a href="https://a.b" target="_blank" rel="noopener noreferrer">https://a.b</a>)'
+    assert render_html("<https://a.b>", None) == '&lt;<a href="https://a.b" target="_blank" rel="noopener noreferrer">https://a.b</a>&gt;'
+
+
+def test_safe_href():
+    assert safe_href("example.com/page") == "http://example.com/page"
+    assert safe_href("localhost:8080") == "http://localhost:8080"
+    assert safe_href("tg://user?id=1") == "tg://user?id=1"
+    assert safe_href("javascript:alert(1)") is None
+    assert safe_href("  ") is None
+
+
+def test_mentions_and_pre():
+    assert render_html("hi @user", [entity("mention", 3, 5)]) == 'hi <a href="https://t.me/user" target="_blank" rel="noopener noreferrer">@user</a>'
+    html = render_html("x = 1", [entity("pre", 0, 5, language='py"><script>')])
+    assert html == '<pre><code class="language-pyscript">x = 1</code></pre>'
@@ -0,0 +1,83 @@
+import asyncio
+import io
+import os
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from app.api import posts as posts_api
+from app.core import storage
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal, engine
+from app.db.storage import charge_storage, get_storage_used
+
+
+def upload(size: int) -> UploadFile:
+    return UploadFile(
+        io.BytesIO(b"x" * size),
+        filename="file.bin",
+        headers=Headers({"content-type": "application/octet-stream"}),
+    )
+
+
+async def create(size: int):
+    async with AsyncSessionLocal() as db:
+        try:
+            return await posts_api.create_post(
+                content=None, link_preview=None, media=[upload(size)],
+                idempotency_key=None, current_user_id=1, db=db,
+            )
+        except HTTPException as e:
+            return e
+
+
+async def storage_used(user_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return await get_storage_used(db, user_id)
+
+
+def test_concurrent_uploads_cannot_overrun_the_quota(postgres, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_QUOTA_BYTES", 1000)
+    monkeypatch.setattr(storage, "MEDIA_DIR", str(tmp_path))
+
+    async def scenario():
+        # Each fits the quota on its own, both read the usage before either commits
+        results = await asyncio.gather(create(600), create(600))
+        used = await storage_used(1)
+        await engine.dispose()
+        return results, used
+
+    results, used = asyncio.run(scenario())
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1 and rejected[0].status_code == 413
+    assert used == 600
+    # The rejected upload's file is gone, the accepted one is kept
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_charge_waits_for_concurrent_charge(postgres, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_QUOTA_BYTES", 1000)
+
+    async def scenario():
+        async with AsyncSessionLocal() as first, AsyncSessionLocal() as second:
+            assert await charge_storage(first, 1, 600)
+            # Blocks on the row lock of the uncommitted first charge
+            pending = asyncio.create_task(charge_storage(second, 1, 600))
+            await asyncio.sleep(0.2)
+            assert not pending.done()
+            await first.commit()
+            charged = await pending
+            await second.commit()
+        results = charged, await charge_storage_in_new_session(400), await storage_used(1)
+        await engine.dispose()
+        return results
+
+    async def charge_storage_in_new_session(delta: int) -> bool:
+        async with AsyncSessionLocal() as db:
+            charged = await charge_storage(db, 1, delta)
+            await db.commit()
+            return charged
+
+    second_charged, exact_fit, used = asyncio.run(scenario())
+    assert not second_charged
+    assert exact_fit
+    assert used == 1000
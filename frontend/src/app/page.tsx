@@ -446,7 +446,7 @@ function TabbedApp() {
     const match = inputText.match(/(https?:\/\/[^\s]+)/);
     const url = match ? match[0] : null;
 
-    if (!url) {
+    if (!url || !userId) {
       if (linkPreview) setLinkPreview(null);
       return;
     }
@@ -456,7 +456,9 @@ function TabbedApp() {
 
     const timer = setTimeout(async () => {
       try {
-        const res = await fetch(`${getApiBaseUrl()}/utils/link-preview?url=${encodeURIComponent(url)}`);
+        const res = await fetch(`${getApiBaseUrl()}/utils/link-preview?url=${encodeURIComponent(url)}`, {
+          headers: { 'Authorization': `Bearer ${userId}` }
+        });
         if (res.ok) {
           const data = await res.json();
           if ((data.title && data.title !== "") || (data.image && data.image !== "")) {
@@ -469,7 +471,7 @@ function TabbedApp() {
     }, 500);
 
     return () => clearTimeout(timer);
-  }, [inputText, dismissedPreviewUrl, linkPreview]);
+  }, [inputText, dismissedPreviewUrl, linkPreview, userId]);
 
 
   // Preview URLs for attachments
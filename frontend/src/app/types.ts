@@ -1,6 +1,7 @@
 export interface MediaItem {
     url: string;
     type: string;
+    too_large?: boolean;
 }
 
 export interface Entity {
@@ -23,6 +24,7 @@ export interface Post {
     telegram_message_id: number;
     content: string | null;
     entities: Entity[];
+    content_html: string | null; // Sanitized HTML, null until the backend has (re-)rendered it
     source_url: string | null;
     media: MediaItem[];
     media_group_id: string | null;
@@ -1,5 +1,5 @@
 import React from 'react';
-import { Entity } from './types';
+import { Entity, Post } from './types';
 
 // Dynamic API Base URL
 export const getApiBaseUrl = () => {
@@ -42,6 +42,16 @@ export function linkifyText(text: string) {
     });
 }
 
+// Post text: the sanitized HTML rendered by the backend, falling back to
+// content + entities for posts it hasn't (re-)rendered yet
+export function PostText({ post, className }: { post: Post; className: string }) {
+    if (post.content_html) {
+        return <div className={`rich-text ${className}`} dangerouslySetInnerHTML={{ __html: post.content_html }} />;
+    }
+    if (!post.content) return null;
+    return <p className={className}>{renderFormattedText(post.content, post.entities)}</p>;
+}
+
 // Helper function to render text with Telegram entities (formatting)
 export function renderFormattedText(text: string | null, entities: Entity[] | string | null) {
     if (!text) return null;
@@ -29,7 +29,7 @@ export const CustomDragLayer = () => {
                 <div className="w-80 bg-white/90 backdrop-blur-xl border border-white/20 rounded-2xl shadow-2xl overflow-hidden ring-1 ring-black/5 pointer-events-none">
                     {post.media && post.media.length > 0 ? (
                         <div className="aspect-video relative">
-                            {post.media[0].type === 'video' ? (
+                            {post.media[0].type === 'video' && !post.media[0].too_large ? (
                                 <div className="w-full h-full bg-black flex items-center justify-center">
                                     <svg className="w-10 h-10 text-white/50" fill="currentColor" viewBox="0 0 20 20">
                                         <path d="M6.3 2.841A1.5 1.5 0 004 4.11v11.78a1.5 1.5 0 002.3 1.269l9.344-5.89a1.5 1.5 0 000-2.538L6.3 2.84z" />
@@ -1,6 +1,6 @@
 import React, { useEffect } from 'react';
 import { Post } from '../app/types';
-import { getApiBaseUrl, renderFormattedText } from '../app/utils';
+import { getApiBaseUrl, PostText } from '../app/utils';
 
 interface LightboxProps {
     selectedPost: Post | null;
@@ -31,7 +31,7 @@ export const Lightbox: React.FC<LightboxProps> = ({
             <div className="relative w-full max-w-5xl h-[80vh] flex flex-col md:flex-row gap-4" onClick={e => e.stopPropagation()}>
                 {/* Media Container */}
                 <div className="flex-1 flex items-center justify-center relative bg-black/50 rounded-lg overflow-hidden">
-                    {selectedPost.media[selectedMediaIndex]?.type === 'photo' ? (
+                    {selectedPost.media[selectedMediaIndex]?.type === 'photo' || selectedPost.media[selectedMediaIndex]?.too_large ? (
                         <img
                             src={`${getApiBaseUrl()}${selectedPost.media[selectedMediaIndex].url}`}
                             alt="Lightbox media"
@@ -89,7 +89,7 @@ export const Lightbox: React.FC<LightboxProps> = ({
                     </div>
 
                     <div className="flex-1 overflow-y-auto no-scrollbar">
-                        {selectedPost.content && <p className="whitespace-pre-wrap">{renderFormattedText(selectedPost.content, selectedPost.entities)}</p>}
+                        <PostText post={selectedPost} className="whitespace-pre-wrap" />
                     </div>
                 </div>
             </div>
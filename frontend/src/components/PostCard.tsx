@@ -1,6 +1,6 @@
 import React, { useRef } from 'react';
 import { Post, Tab } from '../app/types';
-import { getApiBaseUrl, renderFormattedText } from '../app/utils';
+import { getApiBaseUrl, PostText } from '../app/utils';
 
 interface PostCardProps {
     post: Post;
@@ -121,7 +121,7 @@ export const PostCard: React.FC<PostCardProps> = ({
                         'grid-cols-3'
                     }`}>
                     {post.media.map((item, index) => (
-                        item.type === 'photo' ? (
+                        item.type === 'photo' || item.too_large ? (
                             <div
                                 key={index}
                                 className={`relative cursor-pointer overflow-hidden group ${post.media.length > 1 ? 'aspect-square' : ''}`}
@@ -185,7 +185,7 @@ export const PostCard: React.FC<PostCardProps> = ({
             )}
 
             <div className="p-4 md:p-6 pt-2">
-                {post.content && <p className="whitespace-pre-wrap break-words">{renderFormattedText(post.content, post.entities)}</p>}
+                <PostText post={post} className="whitespace-pre-wrap break-words" />
                 <div className="flex justify-between items-center mt-2">
                     <span className="text-xs text-gray-500">
                         {new Date(post.created_at).toLocaleString()}
@@ -64,7 +64,7 @@ export const PostGridItem: React.FC<PostGridItemProps> = ({ post, index, onSwap,
                 {/* Media Thumbnail */}
                 {post.media.length > 0 ? (
                     <div className="relative h-3/5 bg-gray-50 overflow-hidden shrink-0">
-                        {post.media[0].type === 'photo' ? (
+                        {post.media[0].type === 'photo' || post.media[0].too_large ? (
                             <img
                                 src={`${getApiBaseUrl()}${post.media[0].url}`}
                                 alt="Thumbnail"